@@ -0,0 +1,47 @@
+"""Приложения с подменённым MinIO для бенчмарков.
+
+Модуль импортируется и в процессе бенчмарка (режим asgi), и воркерами
+uvicorn: `uvicorn benchmarks.apps:storage_app`. Хранилище записей
+выбирается как обычно, переменной STORAGE_REPOSITORY.
+"""
+
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI
+
+from memes_api.memes_app import memes_app
+from storage_api.dependencies import get_job_service
+from storage_api.storage_app import storage_app
+from .fakes import FakeS3Client
+
+
+def install_fakes() -> FakeS3Client:
+    """Подменяет S3 в storage_app.
+
+    Фоновые задачи отключаются: бенчмарк измеряет только путь запроса.
+    """
+    s3 = FakeS3Client()
+    storage_app.state.minio_client = s3
+    storage_app.state.minio_presign_client = s3
+    storage_app.dependency_overrides[get_job_service] = lambda: None
+    return s3
+
+
+@asynccontextmanager
+async def fake_lifespan(app: FastAPI):
+    # Вместо открытия клиентов MinIO и запуска воркера очереди
+    install_fakes()
+    yield
+
+
+def connect_in_process() -> httpx.AsyncClient:
+    """memes_app обращается к storage_app в том же процессе, без сети."""
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=storage_app), base_url="http://storageapi"
+    )
+    memes_app.state.storage_client = client
+    return client
+
+
+storage_app.router.lifespan_context = fake_lifespan
@@ -0,0 +1,123 @@
+import hashlib
+import itertools
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+
+def client_error(code: str, operation: str, status: int) -> ClientError:
+    return ClientError(
+        {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        operation,
+    )
+
+
+class FakeBody:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    async def read(self, size: Optional[int] = None) -> bytes:
+        end = len(self.data) if size is None else self.position + size
+        chunk = self.data[self.position : end]
+        self.position += len(chunk)
+        return chunk
+
+    async def iter_chunks(self, chunk_size: int):
+        while chunk := await self.read(chunk_size):
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class FakeS3Client:
+    """Объекты в памяти процесса вместо MinIO.
+
+    Поддерживает вызовы aiobotocore, которые делает MinioService.
+    """
+
+    def __init__(self):
+        self.objects: Dict[str, Tuple[bytes, str, datetime]] = {}
+        self.uploads: Dict[str, Dict[int, bytes]] = {}
+        self._upload_ids = itertools.count(1)
+
+    async def put_object(self, Bucket, Key, Body, ContentType="", **kwargs):
+        self.objects[Key] = (bytes(Body), ContentType, datetime.now(timezone.utc))
+        return {"ETag": self._etag(self.objects[Key][0])}
+
+    async def head_object(self, Bucket, Key, **kwargs):
+        if Key not in self.objects:
+            raise client_error("404", "HeadObject", 404)
+        data, content_type, modified = self.objects[Key]
+        return {
+            "ContentLength": len(data),
+            "ContentType": content_type,
+            "ETag": self._etag(data),
+            "LastModified": modified,
+        }
+
+    async def get_object(self, Bucket, Key, Range=None, IfNoneMatch=None, **kwargs):
+        if Key not in self.objects:
+            raise client_error("NoSuchKey", "GetObject", 404)
+        data, content_type, modified = self.objects[Key]
+        etag = self._etag(data)
+        if IfNoneMatch == etag:
+            raise client_error("304", "GetObject", 304)
+        response = {
+            "ContentType": content_type,
+            "ETag": etag,
+            "LastModified": modified,
+            "ResponseMetadata": {"HTTPStatusCode": 200},
+        }
+        if Range:
+            start, _, end = Range.removeprefix("bytes=").partition("-")
+            start, end = int(start), int(end) if end else len(data) - 1
+            if start >= len(data):
+                raise client_error("InvalidRange", "GetObject", 416)
+            response["ContentRange"] = f"bytes {start}-{end}/{len(data)}"
+            response["ResponseMetadata"]["HTTPStatusCode"] = 206
+            data = data[start : end + 1]
+        response["Body"] = FakeBody(data)
+        response["ContentLength"] = len(data)
+        return response
+
+    async def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    async def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self.objects[Key] = self.objects[CopySource["Key"]]
+
+    async def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = str(next(self._upload_ids))
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    async def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": f'"{PartNumber}"'}
+
+    async def complete_multipart_upload(
+        self, Bucket, Key, UploadId, MultipartUpload, **kwargs
+    ):
+        parts = self.uploads.pop(UploadId)
+        data = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+        self.objects[Key] = (data, "", datetime.now(timezone.utc))
+        return {"ETag": self._etag(data)}
+
+    async def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self.uploads.pop(UploadId, None)
+
+    async def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600):
+        return f"http://fake-s3/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+    @staticmethod
+    def _etag(data: bytes) -> str:
+        return f'"{hashlib.md5(data).hexdigest()}"'
@@ -0,0 +1,400 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import resource
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import httpx
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+KIB = 1024
+MIB = 1024 * KIB
+UPLOAD_SIZES = {"small": 16 * KIB, "medium": MIB, "large": 12 * MIB}
+
+# Доли операций в смеси; large больше части multipart-загрузки (8 МиБ)
+SCENARIOS = {
+    "read": {"list": 40, "get": 50, "content": 10},
+    "write": {"upload_small": 40, "upload_medium": 10, "update": 30, "delete": 20},
+    "mixed": {
+        "list": 25,
+        "get": 40,
+        "content": 5,
+        "upload_small": 10,
+        "upload_medium": 3,
+        "upload_large": 2,
+        "update": 10,
+        "delete": 5,
+    },
+}
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class Workload:
+    """Операции над memes_api; id созданных записей запоминаются для чтения."""
+
+    def __init__(self, client: httpx.AsyncClient, seed: int):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.ids: List[int] = []
+        # Уникальная метка прогона: описания не совпадают с прошлыми в Postgres
+        self.run = secrets.token_hex(4)
+        self.counter = itertools.count()
+        self.payload = random.Random(seed).randbytes(max(UPLOAD_SIZES.values()))
+
+    def description(self, n: int) -> str:
+        return f"benchmark meme {self.run} {n}"
+
+    async def upload(self, size: int) -> int:
+        n = next(self.counter)
+        # Префикс делает содержимое уникальным, иначе сработает дедупликация
+        data = f"{self.run}:{n}:".encode() + self.payload[:size]
+        response = await self.client.post(
+            "/memes",
+            files={"meme_data": (f"bench-{n}.jpg", data, "image/jpeg")},
+            data={"meme_description": self.description(n)},
+        )
+        if response.status_code == 200:
+            self.ids.append(response.json()["id"])
+        return response.status_code
+
+    async def list(self) -> int:
+        skip = self.rng.randrange(max(1, len(self.ids) - 20))
+        response = await self.client.get("/memes", params={"skip": skip, "limit": 20})
+        return response.status_code
+
+    async def get(self) -> int:
+        if not self.ids:
+            return await self.list()
+        response = await self.client.get(f"/memes/{self.rng.choice(self.ids)}")
+        return response.status_code
+
+    async def content(self) -> int:
+        if not self.ids:
+            return await self.list()
+        response = await self.client.get(f"/memes/{self.rng.choice(self.ids)}/content")
+        return response.status_code
+
+    async def update(self) -> int:
+        if not self.ids:
+            return await self.list()
+        response = await self.client.put(
+            f"/memes/{self.rng.choice(self.ids)}",
+            json={"meme_description": self.description(next(self.counter))},
+        )
+        return response.status_code
+
+    async def delete(self) -> int:
+        if not self.ids:
+            return await self.list()
+        id = self.ids.pop(self.rng.randrange(len(self.ids)))
+        response = await self.client.delete(f"/memes/{id}")
+        return response.status_code
+
+    def operation(self, name: str):
+        if name.startswith("upload_"):
+            size = UPLOAD_SIZES[name.removeprefix("upload_")]
+            return lambda: self.upload(size)
+        return getattr(self, name)
+
+
+async def run_workload(
+    client: httpx.AsyncClient,
+    scenario: str,
+    requests: int,
+    concurrency: int,
+    seed_rows: int,
+    seed: int = 0,
+) -> dict:
+    workload = Workload(client, seed)
+    for _ in range(seed_rows):
+        await workload.upload(UPLOAD_SIZES["small"])
+
+    mix = SCENARIOS[scenario]
+    plan = iter(workload.rng.choices(list(mix), weights=list(mix.values()), k=requests))
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for name in plan:
+            started = time.perf_counter()
+            try:
+                status = await workload.operation(name)()
+            except httpx.HTTPError:
+                status = 599
+            latencies[name].append(time.perf_counter() - started)
+            # 404/409 - ожидаемый итог гонок между удалением и чтением
+            if status >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    everything = [value for values in latencies.values() for value in values]
+    return {
+        "requests": len(everything),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(everything) / duration, 1),
+        **latency_summary(everything),
+        "operations": {
+            name: {"count": len(values), **latency_summary(values)}
+            for name, values in sorted(latencies.items())
+        },
+    }
+
+
+def latency_summary(values: List[float]) -> dict:
+    return {f"p{p}_ms": round(percentile(values, p) * 1000, 2) for p in (50, 95, 99)}
+
+
+def self_peak_rss() -> int:
+    # ru_maxrss в Linux - в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_tree_peak_rss(pid: int) -> int:
+    """Сумма пикового RSS (VmHWM) процесса и его потомков; только Linux."""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    total += int(line.split()[1]) * 1024
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            for child in children.read().split():
+                total += process_tree_peak_rss(int(child))
+    except OSError:
+        pass
+    return total
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not start in {timeout}s")
+            await asyncio.sleep(0.2)
+
+
+@asynccontextmanager
+async def asgi_services(repo_env: dict):
+    """Оба приложения в процессе бенчмарка, запросы через ASGITransport."""
+    # Configs читаются при импорте приложений, поэтому до него
+    os.environ.update(repo_env)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from benchmarks.apps import connect_in_process, install_fakes, memes_app
+
+    install_fakes()
+    async with connect_in_process(), httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=memes_app), base_url="http://memesapi"
+    ) as client:
+        yield client, self_peak_rss
+
+
+@asynccontextmanager
+async def uvicorn_services(repo_env: dict, workers: int, concurrency: int):
+    """storage_api и memes_api в отдельных процессах uvicorn на localhost."""
+    if repo_env["STORAGE_REPOSITORY"] == "memory" and workers > 1:
+        # У каждого воркера была бы своя копия таблицы
+        raise SystemExit("--repo memory requires --workers 1")
+    storage_port, memes_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        **repo_env,
+        "JOB_WORKER_ENABLED": "false",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        "STORAGE_API_URL": f"http://127.0.0.1:{storage_port}",
+        "STORAGE_API_MAX_CONNECTIONS": str(max(concurrency, 100)),
+    }
+    servers = [
+        ("benchmarks.apps:storage_app", storage_port),
+        ("memes_api.memes_app:memes_app", memes_port),
+    ]
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                app,
+                "--port",
+                str(port),
+                "--workers",
+                str(workers),
+                "--log-level",
+                "warning",
+                "--no-access-log",
+            ],
+            env=env,
+        )
+        for app, port in servers
+    ]
+    try:
+        for _, port in servers:
+            await wait_ready(f"http://127.0.0.1:{port}/")
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{memes_port}", limits=limits, timeout=60
+        ) as client:
+            yield client, lambda: sum(
+                process_tree_peak_rss(process.pid) for process in processes
+            )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+def load_baselines() -> dict:
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, encoding="utf-8") as file:
+        return json.load(file)
+
+
+# Сравниваются только устойчивые величины. p95/p99 при нескольких тысячах
+# запросов определяются единицами больших загрузок и шумом машины
+BASELINE_FIELDS = ("throughput_rps", "p50_ms", "errors")
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {result['throughput_rps']} rps < "
+            f"baseline {baseline['throughput_rps']} rps"
+        )
+    if result["p50_ms"] > baseline["p50_ms"] * (1 + tolerance):
+        regressions.append(f"p50_ms {result['p50_ms']} > baseline {baseline['p50_ms']}")
+    if result["errors"] > baseline.get("errors", 0):
+        regressions.append(f"{result['errors']} errors")
+    return regressions
+
+
+def print_report(key: str, result: dict):
+    print(
+        f"{key}: {result['requests']} requests in {result['duration_s']}s, "
+        f"{result['throughput_rps']} rps, p50 {result['p50_ms']} ms, "
+        f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, "
+        f"errors {result['errors']}, peak RSS {result['peak_rss_mb']} MiB"
+    )
+    for name, stats in result["operations"].items():
+        print(
+            f"  {name:<14} {stats['count']:>6}  p50 {stats['p50_ms']:>8} ms  "
+            f"p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms"
+        )
+
+
+async def benchmark(args) -> int:
+    # Каждый прогон на SQLite начинается с пустого файла
+    database_dir = tempfile.TemporaryDirectory()
+    repo_env = {"STORAGE_REPOSITORY": args.repo}
+    if args.repo == "sqlite":
+        repo_env["SQLITE_URL"] = (
+            f"sqlite+aiosqlite:///{os.path.join(database_dir.name, 'memes.db')}"
+        )
+    if args.mode == "asgi":
+        services = asgi_services(repo_env)
+    else:
+        services = uvicorn_services(repo_env, args.workers, args.concurrency)
+
+    baselines = load_baselines()
+    failed = False
+    async with services as (client, peak_rss):
+        for scenario in args.scenario:
+            key = f"{args.mode}/{args.repo}/{scenario}"
+            result = await run_workload(
+                client, scenario, args.requests, args.concurrency, args.seed_rows
+            )
+            result["peak_rss_mb"] = round(peak_rss() / MIB, 1)
+            print_report(key, result)
+
+            params = {
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed_rows": args.seed_rows,
+            }
+            baseline = baselines.get(key)
+            if args.save_baseline:
+                baselines[key] = {
+                    **params,
+                    **{name: result[name] for name in BASELINE_FIELDS},
+                }
+            elif baseline is None:
+                print("  no baseline")
+            elif any(baseline.get(name) != value for name, value in params.items()):
+                # Числа при другой нагрузке несравнимы
+                print("  baseline was recorded with other parameters, skipped")
+            else:
+                regressions = compare(result, baseline, args.tolerance)
+                for regression in regressions:
+                    print(f"  REGRESSION: {regression}")
+                failed = failed or bool(regressions)
+
+    if args.save_baseline:
+        with open(BASELINES_PATH, "w", encoding="utf-8") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write("\n")
+    database_dir.cleanup()
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memes_api/storage_api")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument(
+        "--repo", choices=("memory", "sqlite", "postgres"), default="memory"
+    )
+    parser.add_argument(
+        "--scenario",
+        choices=list(SCENARIOS),
+        action="append",
+        help="можно указать несколько раз; по умолчанию все",
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed-rows", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+    args.scenario = args.scenario or list(SCENARIOS)
+    sys.exit(asyncio.run(benchmark(args)))
+
+
+if __name__ == "__main__":
+    main()
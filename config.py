@@ -44,6 +44,144 @@ class Configs(BaseSettings):
         database=ENV_DATABASE_MAPPER[ENV],
     )
 
+    # хранилище записей memes: postgres | sqlite | memory
+    # sqlite и memory - для прогонов без Postgres, очередь задач при них отключена
+    STORAGE_REPOSITORY: str = os.getenv("STORAGE_REPOSITORY", "postgres")
+    SQLITE_URL: str = os.getenv("SQLITE_URL", "sqlite+aiosqlite:///memes.db")
+
+    # connection pool (один движок на процесс)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "20"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Кэш подготовленных запросов asyncpg; за pgbouncer нужно ставить 0
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() == "true"
+
+    # pagination
+    MAX_PAGE_SIZE: int = int(os.getenv("MAX_PAGE_SIZE", "100"))
+
+    # batch endpoints
+    BATCH_UPLOAD_MAX_FILES: int = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "20"))
+    BATCH_UPLOAD_CONCURRENCY: int = int(os.getenv("BATCH_UPLOAD_CONCURRENCY", "4"))
+
+    # media cache: memory | redis | none
+    MEDIA_CACHE_BACKEND: str = os.getenv("MEDIA_CACHE_BACKEND", "memory")
+    MEDIA_CACHE_TTL: float = float(os.getenv("MEDIA_CACHE_TTL", "60"))
+    MEDIA_CACHE_MAX_SIZE: int = int(os.getenv("MEDIA_CACHE_MAX_SIZE", "10000"))
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # http caching (Cache-Control по маршрутам)
+    CACHE_CONTROL_MEDIA_LIST: str = os.getenv(
+        "CACHE_CONTROL_MEDIA_LIST", "public, max-age=30"
+    )
+    CACHE_CONTROL_MEDIA_ITEM: str = os.getenv(
+        "CACHE_CONTROL_MEDIA_ITEM", "public, max-age=300"
+    )
+
+    # выдача файлов: stream - через storage_api, redirect - на presigned URL
+    MEDIA_CONTENT_MODE: str = os.getenv("MEDIA_CONTENT_MODE", "stream")
+    PRESIGNED_GET_EXPIRES: int = int(os.getenv("PRESIGNED_GET_EXPIRES", "900"))
+    # public - meme_url как есть, presigned - подписанные ссылки в ответах
+    MEDIA_URL_MODE: str = os.getenv("MEDIA_URL_MODE", "public")
+    # Подписанная ссылка переиспользуется, пока не прошла эта доля её срока
+    PRESIGNED_URL_REFRESH_FRACTION: float = float(
+        os.getenv("PRESIGNED_URL_REFRESH_FRACTION", "0.5")
+    )
+    PRESIGNED_URL_CACHE_SIZE: int = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", "10000"))
+    DOWNLOAD_CHUNK_SIZE: int = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(256 * 1024)))
+    # Содержимое объекта по id не меняется, его можно кэшировать надолго
+    CACHE_CONTROL_MEDIA_CONTENT: str = os.getenv(
+        "CACHE_CONTROL_MEDIA_CONTENT", "public, max-age=86400"
+    )
+
+    # storage api client (memes_api -> storage_api)
+    STORAGE_API_URL: str = os.getenv("STORAGE_API_URL", "http://storageapi:8001")
+    STORAGE_API_MAX_CONNECTIONS: int = int(
+        os.getenv("STORAGE_API_MAX_CONNECTIONS", "100")
+    )
+    STORAGE_API_MAX_KEEPALIVE_CONNECTIONS: int = int(
+        os.getenv("STORAGE_API_MAX_KEEPALIVE_CONNECTIONS", "20")
+    )
+    STORAGE_API_KEEPALIVE_EXPIRY: float = float(
+        os.getenv("STORAGE_API_KEEPALIVE_EXPIRY", "30")
+    )
+    STORAGE_API_CONNECT_TIMEOUT: float = float(
+        os.getenv("STORAGE_API_CONNECT_TIMEOUT", "5")
+    )
+    STORAGE_API_TIMEOUT: float = float(os.getenv("STORAGE_API_TIMEOUT", "10"))
+    STORAGE_API_UPLOAD_TIMEOUT: float = float(
+        os.getenv("STORAGE_API_UPLOAD_TIMEOUT", "120")
+    )
+    # HTTP/2 требует пакет h2 (pip install httpx[http2])
+    STORAGE_API_HTTP2: bool = os.getenv("STORAGE_API_HTTP2", "false").lower() == "true"
+
+    # minio (s3 client pool)
+    MINIO_MAX_POOL_CONNECTIONS: int = int(os.getenv("MINIO_MAX_POOL_CONNECTIONS", "50"))
+    MINIO_CONNECT_TIMEOUT: float = float(os.getenv("MINIO_CONNECT_TIMEOUT", "5"))
+    MINIO_READ_TIMEOUT: float = float(os.getenv("MINIO_READ_TIMEOUT", "60"))
+    MINIO_MAX_ATTEMPTS: int = int(os.getenv("MINIO_MAX_ATTEMPTS", "3"))
+
+    # streaming uploads
+    MINIO_UPLOAD_PART_SIZE: int = int(
+        os.getenv("MINIO_UPLOAD_PART_SIZE", str(8 * 1024 * 1024))
+    )
+    MINIO_UPLOAD_MAX_CONCURRENCY: int = int(
+        os.getenv("MINIO_UPLOAD_MAX_CONCURRENCY", "4")
+    )
+    PRESIGNED_URL_EXPIRES: int = int(os.getenv("PRESIGNED_URL_EXPIRES", "3600"))
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+    # direct uploads (client -> MinIO по presigned URL)
+    # Адрес MinIO, доступный клиентам; presigned URL подписываются на этот хост
+    MINIO_PUBLIC_ENDPOINT: str = os.getenv(
+        "MINIO_PUBLIC_ENDPOINT", os.getenv("MINIO_PATH", "")
+    )
+    # Общий для всех воркеров и реплик; без него storage_api не запускается
+    UPLOAD_TOKEN_SECRET: str = os.getenv("UPLOAD_TOKEN_SECRET", "")
+    DIRECT_UPLOAD_MAX_SIZE: int = int(
+        os.getenv("DIRECT_UPLOAD_MAX_SIZE", str(1024 * 1024 * 1024))
+    )
+
+    # background jobs (таблица jobs в Postgres)
+    JOB_WORKER_ENABLED: bool = os.getenv("JOB_WORKER_ENABLED", "true").lower() == "true"
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BACKOFF: float = float(os.getenv("JOB_RETRY_BACKOFF", "5"))
+    # Задача в running дольше этого времени считается брошенной
+    JOB_LOCK_TIMEOUT: float = float(os.getenv("JOB_LOCK_TIMEOUT", "300"))
+    # Отложенное удаление осиротевшего объекта: параллельная загрузка
+    # того же файла успевает сохранить запись, которая на него ссылается
+    ORPHAN_DELETE_DELAY: float = float(os.getenv("ORPHAN_DELETE_DELAY", "60"))
+
+    # renditions: "имя:размер:формат" через запятую, пустая строка - отключено
+    RENDITIONS: str = os.getenv("RENDITIONS", "thumb:320:webp,medium:1080:webp")
+    RENDITION_QUALITY: int = int(os.getenv("RENDITION_QUALITY", "80"))
+    RENDITION_PROCESS_WORKERS: int = int(os.getenv("RENDITION_PROCESS_WORKERS", "2"))
+    # Больший оригинал целиком в память воркера не читается
+    RENDITION_MAX_SOURCE_SIZE: int = int(
+        os.getenv("RENDITION_MAX_SOURCE_SIZE", str(50 * 1024 * 1024))
+    )
+
+    # tracing: none | stdout | file (span'ы строками JSON)
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "none")
+    TRACING_FILE: str = os.getenv("TRACING_FILE", "traces.jsonl")
+    # Доля трасс, начатых в этом сервисе; входящий traceparent решает сам
+    TRACING_SAMPLE_RATIO: float = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+    TRACING_QUEUE_SIZE: int = int(os.getenv("TRACING_QUEUE_SIZE", "10000"))
+
+    # logging: json | text; уровни модулей "имя:УРОВЕНЬ" через запятую
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS: str = os.getenv(
+        "LOG_LEVELS", "httpx:WARNING,sqlalchemy.engine:WARNING,aiobotocore:WARNING"
+    )
+    # Доля сохраняемых записей ниже WARNING, "логгер:доля" через запятую
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "uvicorn.access:1.0")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
     class Config:
         case_sensitive = True
 
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+from itertools import islice
+from typing import Iterator, List, Optional
+
+from db import engine
+from models.media_models import Meme
+from utils.log_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("id", "meme_url", "meme_description", "content_hash")
+
+
+def read_rows(path: str, file_format: str) -> Iterator[dict]:
+    with open(path, encoding="utf-8", newline="") as file:
+        if file_format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def to_value(column: str, value):
+    if column == "id":
+        return int(value)
+    if column == "content_hash":
+        # Пустая ячейка CSV означает отсутствие хэша, а не хэш ""
+        return value or None
+    return value
+
+
+def to_record(row: dict, columns: List[str]) -> tuple:
+    return tuple(to_value(c, row[c]) for c in columns)
+
+
+def chunked(iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+async def bulk_load(path: str, chunk_size: int, file_format: Optional[str] = None):
+    """Загрузка строк Meme из CSV/JSONL через COPY, по транзакции на пачку."""
+    if file_format is None:
+        file_format = "csv" if path.endswith(".csv") else "jsonl"
+
+    rows = read_rows(path, file_format)
+    first = next(rows, None)
+    if first is None:
+        logger.info("Nothing to load")
+        return 0
+    columns = [c for c in COLUMNS if c in first]
+
+    def records():
+        yield to_record(first, columns)
+        for row in rows:
+            yield to_record(row, columns)
+
+    table = Meme.__tablename__
+    total = 0
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        raw_connection = await conn.get_raw_connection()
+        # Для COPY нужно соединение asyncpg без обёртки SQLAlchemy
+        connection = raw_connection.driver_connection
+
+        for chunk in chunked(records(), chunk_size):
+            async with connection.transaction():
+                await connection.copy_records_to_table(
+                    table, records=chunk, columns=columns
+                )
+            total += len(chunk)
+            elapsed = time.perf_counter() - started
+            logger.info("Loaded %s rows (%.0f rows/s)", total, total / elapsed)
+
+        if "id" in columns:
+            # После вставки с явными id последовательность нужно сдвинуть
+            await connection.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+            )
+
+    elapsed = time.perf_counter() - started
+    logger.info("Done: %s rows in %.1fs (%.0f rows/s)", total, elapsed, total / elapsed)
+    return total
+
+
+def main():
+    setup_logging("bulk_load")
+    parser = argparse.ArgumentParser(description="Bulk load memes from CSV/JSONL")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default=None)
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=int(os.getenv("BULK_LOAD_CHUNK_SIZE", "50000")),
+    )
+    args = parser.parse_args()
+    asyncio.run(bulk_load(args.path, args.chunk_size, args.format))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,140 @@
-from typing import Any
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, List
 
 import sqlalchemy
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy import Table
 from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from config import configs
 
-engine = create_async_engine(configs.DATABASE_URI)
+
+class PoolWaitMetrics:
+    """Примесь к пулу: считает ожидание соединения при checkout.
+
+    Время ожидания включает и открытие нового соединения, когда пул
+    растёт за счёт overflow.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def recreate(self):
+        # Пул пересоздаётся при dispose(); счётчики переносятся в новый
+        pool = super().recreate()
+        pool.checkouts = self.checkouts
+        pool.timeouts = self.timeouts
+        pool.wait_seconds = self.wait_seconds
+        pool.max_wait_seconds = self.max_wait_seconds
+        return pool
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait_seconds,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+class InstrumentedAsyncPool(PoolWaitMetrics, AsyncAdaptedQueuePool):
+    pass
+
+
+def create_engine(db_url: str = configs.DATABASE_URI):
+    return create_async_engine(
+        db_url,
+        echo=configs.DB_ECHO,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=configs.DB_POOL_SIZE,
+        max_overflow=configs.DB_MAX_OVERFLOW,
+        pool_timeout=configs.DB_POOL_TIMEOUT,
+        pool_pre_ping=configs.DB_POOL_PRE_PING,
+        pool_recycle=configs.DB_POOL_RECYCLE,
+        connect_args={
+            # Кэш SQLAlchemy поверх asyncpg и собственный кэш asyncpg
+            "prepared_statement_cache_size": configs.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": configs.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+# Единственный движок процесса: им пользуются приложение, скрипты и тесты
+engine = create_engine()
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
 
+class SQLiteDatabase:
+    """Файл SQLite (aiosqlite) вместо Postgres для локальных и CI-прогонов.
+
+    Миграции alembic рассчитаны на Postgres, поэтому таблицы создаются
+    по моделям при первом обращении.
+    """
+
+    def __init__(self, db_url: str, tables: List[Table]):
+        # Писатели в SQLite идут по одному: ждём блокировку, а не падаем
+        self.engine = create_async_engine(
+            db_url, echo=configs.DB_ECHO, connect_args={"timeout": 30}
+        )
+        sqlalchemy.event.listen(self.engine.sync_engine, "connect", self._set_pragmas)
+        self.tables = tables
+        self._session_maker = async_sessionmaker(self.engine, expire_on_commit=False)
+        self._schema_ready = False
+        self._schema_lock = asyncio.Lock()
+
+    async def create_schema(self) -> None:
+        async with self._schema_lock:
+            if self._schema_ready:
+                return
+            async with self.engine.begin() as conn:
+                await conn.run_sync(self._create_tables)
+            self._schema_ready = True
+
+    @staticmethod
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        # WAL: чтения не ждут завершения записи
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    def _create_tables(self, connection) -> None:
+        for table in self.tables:
+            table.create(connection, checkfirst=True)
+
+    @asynccontextmanager
+    async def session(self):
+        if not self._schema_ready:
+            await self.create_schema()
+        async with self._session_maker() as session:
+            yield session
+
+
 @sqlalchemy.orm.as_declarative()
 class BaseModel:
     id: Any
@@ -25,8 +149,11 @@ Base = declarative_base(cls=BaseModel)
 
 
 class Database:
-    def __init__(self, db_url: str) -> None:
-        self._engine = create_async_engine(db_url, echo=True)
+    def __init__(self, db_url: str = configs.DATABASE_URI) -> None:
+        # Второй движок означал бы второй пул соединений к той же базе
+        self._engine = (
+            engine if db_url == configs.DATABASE_URI else create_engine(db_url)
+        )
 
     def create_database(self) -> None:
         BaseModel.metadata.create_all(self._engine)
@@ -1,7 +1,7 @@
 import asyncio
 import logging
 
-from sqlalchemy import insert
+from sqlalchemy import insert, text
 
 from db import Base, engine, async_session_maker
 from models.media_models import Meme
@@ -14,10 +14,15 @@ async def populate():
         await conn.run_sync(Base.metadata.create_all)
 
     async with async_session_maker() as session:
-        for item in data:
-            stmt = insert(Meme).values(item)
-            await session.execute(stmt)
-            await session.commit()
+        # Все строки одной пачкой и одним коммитом
+        await session.execute(insert(Meme), data)
+        await session.execute(
+            text(
+                "SELECT setval(pg_get_serial_sequence('memes', 'id'), "
+                "COALESCE((SELECT MAX(id) FROM memes), 0) + 1, false)"
+            )
+        )
+        await session.commit()
         logging.info("Database was populated")
 
 
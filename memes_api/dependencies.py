@@ -0,0 +1,10 @@
+import httpx
+from fastapi import Request
+
+
+def get_storage_client(request: Request) -> httpx.AsyncClient:
+    # Клиент открывает и закрывает только lifespan приложения
+    storage_client = getattr(request.app.state, "storage_client", None)
+    if storage_client is None:
+        raise RuntimeError("storage_api client is not open: lifespan has not run")
+    return storage_client
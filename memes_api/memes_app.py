@@ -1,20 +1,100 @@
 import logging
-import os
-from typing import List
+from contextlib import asynccontextmanager
+from typing import Annotated, List, Optional
 
 import httpx
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query
+from fastapi import (
+    Depends,
+    FastAPI,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
-from memes_schemas.memes_schemas import MemeUpdate, MemeRead
+from config import configs
+from memes_schemas.memes_schemas import (
+    MemeBatchDelete,
+    MemeBatchDeleted,
+    MemePage,
+    MemeUpdate,
+    MemeRead,
+    MemeUploadComplete,
+    MemeUploadCreate,
+    MemeUploadTicket,
+)
+from utils.log_config import setup_logging
+from utils.metrics import MetricsMiddleware, metrics_response, register_stats
+from utils.streaming import iter_upload_file
+from utils.tracing import TracingMiddleware
+from .dependencies import get_storage_client
+from .storage_client import create_storage_client, http_pool_stats, upload_timeout
 
-logging.basicConfig(level=logging.INFO)
+setup_logging("memes_api")
+logger = logging.getLogger(__name__)
 
-memes_app = FastAPI(title="Public service for memes")
 
-load_dotenv()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with create_storage_client() as client:
+        app.state.storage_client = client
+        yield
 
-STORAGE_API_URL = os.getenv("STORAGE_API_URL")
+
+memes_app = FastAPI(title="Public service for memes", lifespan=lifespan)
+memes_app.add_middleware(MetricsMiddleware, app_name="memes_api")
+memes_app.add_middleware(TracingMiddleware, service="memes_api")
+
+
+def storage_client_pool_stats() -> dict:
+    client = getattr(memes_app.state, "storage_client", None)
+    return http_pool_stats(client) if client is not None else {}
+
+
+register_stats("storage_client_pool", storage_client_pool_stats)
+
+StorageClient = Annotated[httpx.AsyncClient, Depends(get_storage_client)]
+
+# Заголовки валидации кэша, которые memes_api пробрасывает между клиентом и storage_api
+CACHE_REQUEST_HEADERS = ("If-None-Match",)
+CACHE_RESPONSE_HEADERS = ("ETag", "Cache-Control")
+# Заголовки, с которыми пробрасывается содержимое файла
+CONTENT_REQUEST_HEADERS = ("Range", "If-None-Match", "If-Modified-Since")
+CONTENT_RESPONSE_HEADERS = (
+    "Content-Type",
+    "Content-Length",
+    "Content-Range",
+    "Accept-Ranges",
+    "ETag",
+    "Last-Modified",
+    "Cache-Control",
+    "Location",
+)
+# На ошибке FastAPI пишет своё JSON-тело: длину и тип storage_api не переносим
+CONTENT_ERROR_HEADERS = (
+    "Content-Range",
+    "Accept-Ranges",
+    "ETag",
+    "Last-Modified",
+    "Cache-Control",
+)
+
+
+def forward_cache_headers(source, target, names=CACHE_RESPONSE_HEADERS):
+    for name in names:
+        if name in source:
+            target[name] = source[name]
+
+
+def not_modified_response(storage_response: httpx.Response) -> Response:
+    response = Response(status_code=304)
+    forward_cache_headers(storage_response.headers, response.headers)
+    return response
 
 
 @memes_app.get("/")
@@ -22,68 +102,176 @@ async def root():
     return "service is working"
 
 
-@memes_app.get("/memes", response_model=List[MemeRead])
-async def get_memes(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1)):
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{STORAGE_API_URL}/media", params={"skip": skip, "limit": limit}
-            )
-            response.raise_for_status()
-            media = response.json()
-            logging.info(f"Received media: {media}")
+@memes_app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
 
-            return media
+@memes_app.get("/memes", response_model=MemePage)
+async def get_memes(
+    client: StorageClient,
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=configs.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    ids: Optional[List[int]] = Query(None, max_length=configs.MAX_PAGE_SIZE),
+):
+    params = {"skip": skip, "limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    if ids:
+        params["ids"] = ids
+    headers = {}
+    forward_cache_headers(request.headers, headers, CACHE_REQUEST_HEADERS)
+    try:
+        storage_response = await client.get("/media", params=params, headers=headers)
+        if storage_response.status_code == 304:
+            return not_modified_response(storage_response)
+        storage_response.raise_for_status()
+        media = storage_response.json()
+        forward_cache_headers(storage_response.headers, response.headers)
+        return media
     except httpx.HTTPStatusError as e:
-        logging.error(f"HTTP error occurred: {str(e)}")
+        logger.error("HTTP error occurred: %s", e)
         raise HTTPException(status_code=e.response.status_code)
     except httpx.RequestError as e:
-        logging.error(f"Request error occurred: {str(e)}")
+        logger.error("Request error occurred: %s", e)
+        raise HTTPException(status_code=500, detail="Service is unavailable")
+
+
+@memes_app.get("/memes/search", response_model=MemePage)
+async def search_memes(
+    client: StorageClient,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=configs.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+):
+    params = {"q": q, "limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    try:
+        response = await client.get("/media/search", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=e.response.json().get("detail", "Search failed"),
+        )
+    except httpx.RequestError as e:
+        logger.error("Request error occurred: %s", e)
         raise HTTPException(status_code=500, detail="Service is unavailable")
 
 
 @memes_app.get("/memes/{id}", response_model=MemeRead)
-async def get_single_meme(id: int):
+async def get_single_meme(
+    client: StorageClient, request: Request, response: Response, id: int
+):
+    headers = {}
+    forward_cache_headers(request.headers, headers, CACHE_REQUEST_HEADERS)
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{STORAGE_API_URL}/media/{id}")
-            response.raise_for_status()
-            media = response.json()
-            return media
+        storage_response = await client.get(f"/media/{id}", headers=headers)
+        if storage_response.status_code == 304:
+            return not_modified_response(storage_response)
+        storage_response.raise_for_status()
+        media = storage_response.json()
+        forward_cache_headers(storage_response.headers, response.headers)
+        return media
     except httpx.HTTPStatusError as e:
         raise HTTPException(
             status_code=e.response.status_code, detail="Object not found."
         )
     except httpx.RequestError as e:
-        logging.error(f"Request error occurred: {str(e)}")
+        logger.error("Request error occurred: %s", e)
+        raise HTTPException(status_code=500, detail="Service is unavailable")
+
+
+@memes_app.get("/memes/{id}/content")
+async def get_meme_content(
+    client: StorageClient,
+    request: Request,
+    id: int,
+    rendition: Optional[str] = Query(None),
+):
+    headers = {}
+    forward_cache_headers(request.headers, headers, CONTENT_REQUEST_HEADERS)
+    params = {"rendition": rendition} if rendition else {}
+    try:
+        storage_request = client.build_request(
+            "GET", f"/media/{id}/content", params=params, headers=headers
+        )
+        storage_response = await client.send(storage_request, stream=True)
+    except httpx.RequestError as e:
+        logger.error("Request error occurred: %s", e)
         raise HTTPException(status_code=500, detail="Service is unavailable")
 
+    status_code = storage_response.status_code
+    if status_code >= 400:
+        error_headers = {}
+        forward_cache_headers(
+            storage_response.headers, error_headers, CONTENT_ERROR_HEADERS
+        )
+        try:
+            await storage_response.aread()
+        finally:
+            await storage_response.aclose()
+        # Тело ошибки может быть пустым (416) или не JSON (страница прокси)
+        try:
+            detail = storage_response.json().get("detail", "Failed to get content")
+        except (ValueError, AttributeError):
+            detail = "Failed to get content"
+        raise HTTPException(
+            status_code=status_code, detail=detail, headers=error_headers
+        )
+
+    response_headers = {}
+    forward_cache_headers(
+        storage_response.headers, response_headers, CONTENT_RESPONSE_HEADERS
+    )
+    if status_code in (304, 307):
+        # Тела нет: 304 или перенаправление на presigned URL
+        await storage_response.aclose()
+        return Response(status_code=status_code, headers=response_headers)
+
+    # Тело пересылается чанками по мере чтения, без буферизации файла
+    return StreamingResponse(
+        storage_response.aiter_raw(),
+        status_code=status_code,
+        headers=response_headers,
+        background=BackgroundTask(storage_response.aclose),
+    )
+
 
 @memes_app.post("/memes", response_model=MemeRead)
 async def upload_meme(
+    client: StorageClient,
     meme_data: UploadFile = File(...),
     meme_description: str = Form(...),
 ):
-    form_data = {
+    params = {
         "media_description": meme_description,
+        "file_name": meme_data.filename,
     }
-    files = {
-        "media_data": (meme_data.filename, meme_data.file, meme_data.content_type),
-    }
+    headers = {}
+    if meme_data.content_type:
+        headers["Content-Type"] = meme_data.content_type
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{STORAGE_API_URL}/media",
-                data=form_data,
-                files=files,
-            )
-            response.raise_for_status()
-            media = response.json()
-            return media
+        # Файл передаётся в storage_api потоком, без повторной multipart-упаковки
+        response = await client.post(
+            "/media/stream",
+            params=params,
+            headers=headers,
+            content=iter_upload_file(meme_data),
+            timeout=upload_timeout(),
+        )
+        response.raise_for_status()
+        media = response.json()
+        return media
     except httpx.HTTPStatusError as e:
         # Логирование статуса и ответа сервера
-        logging.error(
-            f"HTTP error occurred: {e.response.status_code} - {e.response.text}"
+        logger.error(
+            "HTTP error occurred: %s - %s", e.response.status_code, e.response.text
         )
         if e.response.status_code == 409:
             raise HTTPException(
@@ -97,21 +285,104 @@ async def upload_meme(
     except httpx.RequestError:
         raise HTTPException(status_code=504, detail="Failed to upload file to storage")
     except Exception as e:
-        logging.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@memes_app.post("/memes/uploads", response_model=MemeUploadTicket)
+async def create_meme_upload(client: StorageClient, meme_upload: MemeUploadCreate):
+    # Клиент получает presigned URL и загружает файл напрямую в MinIO
+    try:
+        response = await client.post("/media/uploads", json=meme_upload.model_dump())
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=e.response.json().get("detail", "Failed to create upload"),
+        )
+    except httpx.RequestError as e:
+        logger.error("Request error occurred: %s", e)
+        raise HTTPException(status_code=500, detail="Service is unavailable")
+
+
+@memes_app.post("/memes/uploads/{token}/complete", response_model=MemeRead)
+async def complete_meme_upload(
+    client: StorageClient, token: str, meme_upload: MemeUploadComplete
+):
+    try:
+        response = await client.post(
+            f"/media/uploads/{token}/complete", json=meme_upload.model_dump()
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=e.response.json().get("detail", "Failed to complete upload"),
+        )
+    except httpx.RequestError as e:
+        logger.error("Request error occurred: %s", e)
+        raise HTTPException(status_code=500, detail="Service is unavailable")
+
+
+@memes_app.post("/memes/batch", response_model=List[MemeRead])
+async def upload_meme_batch(
+    client: StorageClient,
+    meme_data: List[UploadFile] = File(...),
+    meme_description: List[str] = Form(...),
+):
+    form_data = {"media_description": meme_description}
+    files = [
+        ("media_data", (meme.filename, meme.file, meme.content_type))
+        for meme in meme_data
+    ]
+    try:
+        response = await client.post(
+            "/media/batch", data=form_data, files=files, timeout=upload_timeout()
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            "HTTP error occurred: %s - %s", e.response.status_code, e.response.text
+        )
+        try:
+            detail = e.response.json().get("detail", "Internal Server Error")
+        except ValueError:
+            detail = "Internal Server Error"
+        raise HTTPException(status_code=e.response.status_code, detail=detail)
+    except httpx.RequestError:
+        raise HTTPException(status_code=504, detail="Failed to upload file to storage")
+
+
+@memes_app.delete("/memes/batch", response_model=MemeBatchDeleted)
+async def delete_meme_batch(client: StorageClient, meme_batch: MemeBatchDelete):
+    try:
+        response = await client.request(
+            "DELETE", "/media/batch", json=meme_batch.model_dump()
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code, detail=e.response.json()
+        )
+    except httpx.RequestError as e:
+        logger.error("Request error occurred: %s", e)
+        raise HTTPException(status_code=500, detail="Service is unavailable")
+
+
 @memes_app.put("/memes/{id}", response_model=MemeRead)
-async def update_meme(id: int, meme_update: MemeUpdate):
+async def update_meme(client: StorageClient, id: int, meme_update: MemeUpdate):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                f"{STORAGE_API_URL}/media/{id}",
-                json=meme_update.dict(),
-            )
-            response.raise_for_status()
-            media = response.json()
-            return media
+        response = await client.put(
+            f"/media/{id}",
+            json=meme_update.dict(),
+        )
+        response.raise_for_status()
+        media = response.json()
+        return media
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 409:
             raise HTTPException(
@@ -126,17 +397,16 @@ async def update_meme(id: int, meme_update: MemeUpdate):
                 status_code=e.response.status_code, detail=e.response.json()
             )
     except httpx.RequestError as e:
-        logging.error(f"Request error occurred: {str(e)}")
+        logger.error("Request error occurred: %s", e)
         raise HTTPException(status_code=500, detail="Service is unavailable")
 
 
 @memes_app.delete("/memes/{id}")
-async def delete_single_meme(id: int):
+async def delete_single_meme(client: StorageClient, id: int):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(f"{STORAGE_API_URL}/media/{id}")
-            response.raise_for_status()
-            return {"message": "Media successfully deleted."}
+        response = await client.delete(f"/media/{id}")
+        response.raise_for_status()
+        return {"message": "Media successfully deleted."}
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             raise HTTPException(
@@ -147,5 +417,5 @@ async def delete_single_meme(id: int):
                 status_code=e.response.status_code, detail=e.response.json()
             )
     except httpx.RequestError as e:
-        logging.error(f"Request error occurred: {str(e)}")
+        logger.error("Request error occurred: %s", e)
         raise HTTPException(status_code=500, detail="Service is unavailable")
@@ -0,0 +1,99 @@
+import time
+
+import httpx
+
+from config import configs
+from utils.metrics import STAGE_LATENCY, path_template
+from utils.tracing import child_span
+
+
+async def _mark_request_start(request: httpx.Request):
+    request.extensions["started_at"] = time.perf_counter()
+    span = child_span(
+        f"downstream {request.method} {path_template(request.url.path)}",
+        **{"http.method": request.method, "http.url": str(request.url)},
+    )
+    if span is not None:
+        # storage_api продолжит трассу от этого span'а
+        request.headers["traceparent"] = span.context.traceparent()
+        request.extensions["span"] = span
+
+
+async def _observe_downstream(response: httpx.Response):
+    # Время до получения заголовков ответа storage_api
+    request = response.request
+    started = request.extensions.get("started_at")
+    if started is not None:
+        stage = f"downstream {request.method} {path_template(request.url.path)}"
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - started)
+    span = request.extensions.get("span")
+    if span is not None:
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.status = "error"
+        span.end()
+
+
+class TracedTransport(httpx.AsyncHTTPTransport):
+    """Завершает span запроса, если ответа не было.
+
+    При ошибке соединения или таймауте хук response не вызывается,
+    и без этого span не завершился бы и не попал в экспорт.
+    """
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            return await super().handle_async_request(request)
+        except BaseException as e:
+            span = request.extensions.get("span")
+            if span is not None:
+                span.status = "error"
+                span.set_attribute("error", repr(e))
+                span.end()
+            raise
+
+
+def create_storage_client() -> httpx.AsyncClient:
+    """Пул соединений memes_api -> storage_api, один на процесс.
+
+    Клиент создаётся в lifespan приложения и переиспользуется всеми
+    обработчиками, поэтому соединения с storage_api держатся keep-alive.
+    """
+    limits = httpx.Limits(
+        max_connections=configs.STORAGE_API_MAX_CONNECTIONS,
+        max_keepalive_connections=configs.STORAGE_API_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=configs.STORAGE_API_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        configs.STORAGE_API_TIMEOUT, connect=configs.STORAGE_API_CONNECT_TIMEOUT
+    )
+    return httpx.AsyncClient(
+        base_url=configs.STORAGE_API_URL,
+        transport=TracedTransport(limits=limits, http2=configs.STORAGE_API_HTTP2),
+        timeout=timeout,
+        event_hooks={
+            "request": [_mark_request_start],
+            "response": [_observe_downstream],
+        },
+    )
+
+
+def http_pool_stats(client: httpx.AsyncClient) -> dict:
+    # httpx не даёт публичного API для пула, поэтому читаем пул httpcore
+    pool = getattr(client._transport, "_pool", None)
+    connections = getattr(pool, "connections", [])
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+        "max_connections": configs.STORAGE_API_MAX_CONNECTIONS,
+    }
+
+
+def upload_timeout() -> httpx.Timeout:
+    # Загрузка файла может идти дольше обычного запроса
+    return httpx.Timeout(
+        configs.STORAGE_API_UPLOAD_TIMEOUT,
+        connect=configs.STORAGE_API_CONNECT_TIMEOUT,
+    )
@@ -1,13 +1,49 @@
-from schemas.media_schemas import MediaUpdate, MediaRead, MediaCreate
+from typing import List
+
+from schemas.media_schemas import (
+    MediaBatchDelete,
+    MediaBatchDeleted,
+    MediaUpdate,
+    MediaRead,
+    MediaCreate,
+    MediaPage,
+    MediaUploadComplete,
+    MediaUploadCreate,
+    MediaUploadTicket,
+)
 
 
 class MemeRead(MediaRead):
     pass
 
 
+class MemePage(MediaPage):
+    items: List[MemeRead]
+
+
+class MemeBatchDelete(MediaBatchDelete):
+    pass
+
+
+class MemeBatchDeleted(MediaBatchDeleted):
+    pass
+
+
 class MemeCreate(MediaCreate):
     pass
 
 
 class MemeUpdate(MediaUpdate):
     pass
+
+
+class MemeUploadCreate(MediaUploadCreate):
+    pass
+
+
+class MemeUploadTicket(MediaUploadTicket):
+    pass
+
+
+class MemeUploadComplete(MediaUploadComplete):
+    pass
@@ -0,0 +1,50 @@
+"""add meme search vector
+
+Revision ID: 476107656330
+Revises: a3f499f9c0d3
+Create Date: 2026-10-18 10:12:41.305114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "476107656330"
+down_revision: Union[str, None] = "a3f499f9c0d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    table_name = "memes"
+
+    # Описания бывают и на русском, и на английском - индексируются обе конфигурации
+    op.add_column(
+        table_name,
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "to_tsvector('russian', coalesce(meme_description, '')) "
+                "|| to_tsvector('english', coalesce(meme_description, ''))",
+                persisted=True,
+            ),
+        ),
+    )
+    op.create_index(
+        "ix_memes_search_vector",
+        table_name,
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    table_name = "memes"
+    op.drop_index("ix_memes_search_vector", table_name=table_name)
+    op.drop_column(table_name, "search_vector")
@@ -0,0 +1,27 @@
+"""add meme renditions
+
+Revision ID: 5b7d93e0a1c6
+Revises: e81f0c3a6d24
+Create Date: 2026-10-18 13:41:06.280517
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5b7d93e0a1c6"
+down_revision: Union[str, None] = "e81f0c3a6d24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("memes", sa.Column("renditions", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("memes", "renditions")
@@ -0,0 +1,37 @@
+"""add meme content hash
+
+Revision ID: 9c2e41d7b5a8
+Revises: 476107656330
+Create Date: 2026-10-18 11:02:17.448201
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9c2e41d7b5a8"
+down_revision: Union[str, None] = "476107656330"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    table_name = "memes"
+
+    # У старых записей хэша нет, поэтому колонка допускает NULL
+    op.add_column(
+        table_name, sa.Column("content_hash", sa.String(length=64), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_memes_content_hash"), table_name, ["content_hash"], unique=True
+    )
+
+
+def downgrade() -> None:
+    table_name = "memes"
+    op.drop_index(op.f("ix_memes_content_hash"), table_name=table_name)
+    op.drop_column(table_name, "content_hash")
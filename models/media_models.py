@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import JSON, Column, Integer, String
 from sqlalchemy.orm import declarative_base
 
 from schemas.media_schemas import MediaRead
@@ -11,8 +11,20 @@ class Meme(Base):
     id = Column(Integer, primary_key=True)
     meme_url = Column(String, nullable=False, unique=True)
     meme_description = Column(String, nullable=False, unique=True)
+    # SHA-256 содержимого файла, по нему находятся повторные загрузки
+    content_hash = Column(String(64), nullable=True, unique=True, index=True)
+    # Заполняются фоновой задачей после загрузки
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    # {"thumb": {"url": ..., "width": ..., "height": ...}, ...}
+    renditions = Column(JSON, nullable=True)
 
     def to_read_model(self):
         return MediaRead(
-            id=self.id, meme_url=self.meme_url, meme_description=self.meme_description
+            id=self.id,
+            meme_url=self.meme_url,
+            meme_description=self.meme_description,
+            width=self.width,
+            height=self.height,
+            renditions=self.renditions or {},
         )
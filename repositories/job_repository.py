@@ -0,0 +1,113 @@
+from datetime import timedelta
+from typing import List
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+
+from models.job_models import Job
+from schemas.job_schemas import JobRead
+from utils.metrics import timed
+from utils.repository import SQLAlchemyRepository
+
+
+class JobRepository(SQLAlchemyRepository):
+    model = Job
+
+    @timed("db.jobs.enqueue")
+    async def enqueue(
+        self, kind: str, payload: dict, max_attempts: int, delay: float = 0
+    ) -> JobRead:
+        async with self.session_maker() as session:
+            stmt = (
+                insert(self.model)
+                .values(
+                    kind=kind,
+                    payload=payload,
+                    status="pending",
+                    attempts=0,
+                    max_attempts=max_attempts,
+                    run_at=func.now() + timedelta(seconds=delay),
+                )
+                .returning(self.model)
+            )
+            res = await session.execute(stmt)
+            job = res.scalar().to_read_model()
+            await session.commit()
+            return job
+
+    @timed("db.jobs.claim")
+    async def claim(self, limit: int, lock_timeout: float) -> List[JobRead]:
+        """Забирает до limit готовых задач одним запросом.
+
+        FOR UPDATE SKIP LOCKED позволяет нескольким воркерам разбирать
+        очередь параллельно, не блокируя друг друга. Задачи, зависшие в
+        running дольше lock_timeout (воркер упал), забираются повторно,
+        а исчерпавшие попытки помечаются failed.
+        """
+        stale = and_(
+            self.model.status == "running",
+            self.model.locked_at < func.now() - timedelta(seconds=lock_timeout),
+        )
+        async with self.session_maker() as session:
+            # Иначе такая задача осталась бы в running навсегда
+            await session.execute(
+                update(self.model)
+                .where(stale, self.model.attempts >= self.model.max_attempts)
+                .values(
+                    status="failed",
+                    locked_at=None,
+                    last_error="Lock timeout exceeded on the last attempt",
+                )
+            )
+            ready = select(self.model.id).where(
+                or_(
+                    and_(
+                        self.model.status == "pending",
+                        self.model.run_at <= func.now(),
+                    ),
+                    and_(stale, self.model.attempts < self.model.max_attempts),
+                )
+            )
+            ready = (
+                ready.order_by(self.model.run_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            stmt = (
+                update(self.model)
+                .where(self.model.id.in_(ready.scalar_subquery()))
+                .values(
+                    status="running",
+                    locked_at=func.now(),
+                    attempts=self.model.attempts + 1,
+                )
+                .returning(self.model)
+            )
+            res = await session.execute(stmt)
+            jobs = [obj.to_read_model() for obj in res.scalars()]
+            await session.commit()
+            return jobs
+
+    @timed("db.jobs.complete")
+    async def complete(self, id: int) -> None:
+        # Выполненные задачи не хранятся, чтобы таблица очереди не росла
+        async with self.session_maker() as session:
+            await session.execute(delete(self.model).where(self.model.id == id))
+            await session.commit()
+
+    @timed("db.jobs.fail")
+    async def fail(self, job: JobRead, error: str, retry_in: float) -> None:
+        if job.attempts >= job.max_attempts:
+            values = {"status": "failed"}
+        else:
+            values = {
+                "status": "pending",
+                "run_at": func.now() + timedelta(seconds=retry_in),
+            }
+        async with self.session_maker() as session:
+            stmt = (
+                update(self.model)
+                .where(self.model.id == job.id)
+                .values(locked_at=None, last_error=error[:2000], **values)
+            )
+            await session.execute(stmt)
+            await session.commit()
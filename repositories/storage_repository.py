@@ -1,6 +1,112 @@
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+from sqlalchemy import REAL, bindparam, func, literal_column, select, tuple_
+
+from config import configs
+from database.db import SQLiteDatabase
 from models.media_models import Meme
-from utils.repository import SQLAlchemyRepository
+from schemas.media_schemas import MediaRead
+from utils.metrics import timed
+from utils.repository import (
+    InMemoryRepository,
+    SQLAlchemyRepository,
+    SQLiteRepository,
+)
+
+_sqlite_database: Optional[SQLiteDatabase] = None
+
+
+def sqlite_database() -> SQLiteDatabase:
+    # Движок создаётся только при выборе SQLite: aiosqlite нужен лишь тогда
+    global _sqlite_database
+    if _sqlite_database is None:
+        _sqlite_database = SQLiteDatabase(configs.SQLITE_URL, [Meme.__table__])
+    return _sqlite_database
 
 
 class StorageRepository(SQLAlchemyRepository):
     model = Meme
+
+    @timed("db.search")
+    async def search(
+        self,
+        query: str,
+        limit: int = 10,
+        after: Optional[Tuple[float, int]] = None,
+    ) -> List[Tuple[MediaRead, float]]:
+        # Колонка search_vector вычисляется в БД (см. миграцию 476107656330)
+        search_vector = literal_column(f"{self.model.__tablename__}.search_vector")
+        ts_query = func.websearch_to_tsquery("russian", query).op("||")(
+            func.websearch_to_tsquery("english", query)
+        )
+        rank = func.ts_rank_cd(search_vector, ts_query)
+
+        async with self.session_maker() as session:
+            stmt = (
+                select(self.model, rank.label("rank"))
+                .where(search_vector.op("@@")(ts_query))
+                .order_by(rank.desc(), self.model.id.desc())
+                .limit(limit)
+            )
+            if after is not None:
+                # Keyset-пагинация по паре (rank, id)
+                after_rank, after_id = after
+                stmt = stmt.where(
+                    tuple_(rank, self.model.id)
+                    < tuple_(bindparam("after_rank", after_rank, type_=REAL), after_id)
+                )
+            res = await session.execute(stmt)
+            return [(obj.to_read_model(), rank) for obj, rank in res.all()]
+
+
+class SQLiteStorageRepository(SQLiteRepository):
+    model = Meme
+
+    def __init__(self, database: Optional[SQLiteDatabase] = None):
+        super().__init__(database or sqlite_database())
+
+    @timed("db.search")
+    async def search(
+        self,
+        query: str,
+        limit: int = 10,
+        after: Optional[Tuple[float, int]] = None,
+    ) -> List[Tuple[MediaRead, float]]:
+        # Без полнотекстового индекса: все слова запроса - подстроки описания,
+        # ранг у всех совпадений одинаковый, порядок - по id
+        async with self.session_maker() as session:
+            stmt = select(self.model).order_by(self.model.id.desc()).limit(limit)
+            for word in query.split():
+                stmt = stmt.where(
+                    self.model.meme_description.icontains(word, autoescape=True)
+                )
+            if after is not None:
+                stmt = stmt.where(self.model.id < after[1])
+            res = await session.scalars(stmt)
+            return [(obj.to_read_model(), 1.0) for obj in res]
+
+
+class InMemoryStorageRepository(InMemoryRepository):
+    model = Meme
+    unique_fields = ("meme_url", "meme_description", "content_hash")
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 10,
+        after: Optional[Tuple[float, int]] = None,
+    ) -> List[Tuple[MediaRead, float]]:
+        # Та же семантика, что у SQLiteStorageRepository.search
+        words = query.lower().split()
+        found = []
+        # Поиск идёт от новых записей; продолжение страницы - сразу с after
+        end = bisect_left(self.ids, after[1]) if after is not None else len(self.ids)
+        for position in range(end - 1, -1, -1):
+            id = self.ids[position]
+            description = self.rows[id].meme_description.lower()
+            if all(word in description for word in words):
+                found.append((self.rows[id].to_read_model(), 1.0))
+                if len(found) == limit:
+                    break
+        return found
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class JobRead(BaseModel):
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+
+    class ConfigDict:
+        from_attributes = True
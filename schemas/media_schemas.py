@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class MediaCreate(BaseModel):
@@ -8,17 +8,75 @@ class MediaCreate(BaseModel):
     meme_description: str
 
 
+class MediaRendition(BaseModel):
+    url: str
+    width: int
+    height: int
+
+
 class MediaRead(BaseModel):
     id: int
     meme_url: str
     meme_description: str
+    # Размеры и уменьшенные копии появляются после фоновой обработки
+    width: Optional[int] = None
+    height: Optional[int] = None
+    renditions: Dict[str, MediaRendition] = {}
 
     class ConfigDict:
         from_attributes = True
 
 
+class MediaPage(BaseModel):
+    items: List[MediaRead]
+    count: int
+    next_cursor: Optional[str] = None
+
+
+class MediaBatchDelete(BaseModel):
+    ids: List[int] = Field(min_length=1)
+
+
+class MediaBatchDeleted(BaseModel):
+    deleted: List[int]
+    missing: List[int]
+
+
 class MediaUpdate(BaseModel):
     meme_description: Optional[str] = None
 
     class ConfigDict:
         from_attributes = True
+
+
+class MediaUploadCreate(BaseModel):
+    file_name: str
+    content_type: str = "image/jpeg"
+    size: int = Field(gt=0)
+    meme_description: str
+    # SHA-256 файла: повтор уже загруженного файла отклоняется сразу,
+    # до передачи байтов, а при записи его сверяет MinIO
+    sha256: str = Field(pattern="^[0-9a-f]{64}$")
+
+
+class MediaUploadPart(BaseModel):
+    part_number: int
+    upload_url: str
+
+
+class MediaUploadTicket(BaseModel):
+    token: str
+    expires_in: int
+    # Для небольших файлов - один PUT, для больших - multipart по частям
+    upload_url: Optional[str] = None
+    part_size: Optional[int] = None
+    parts: List[MediaUploadPart] = []
+
+
+class MediaUploadedPart(BaseModel):
+    part_number: int
+    etag: str
+
+
+class MediaUploadComplete(BaseModel):
+    parts: List[MediaUploadedPart] = []
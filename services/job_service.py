@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from config import configs
+from schemas.job_schemas import JobRead
+from utils.repository import AbstractRepository
+
+logger = logging.getLogger(__name__)
+
+# Типы фоновых задач
+EXTRACT_METADATA = "extract_metadata"
+GENERATE_RENDITIONS = "generate_renditions"
+DELETE_OBJECT = "delete_object"
+VERIFY_UPLOAD = "verify_upload"
+
+JobHandler = Callable[[dict], Awaitable[None]]
+
+
+class JobService:
+    def __init__(
+        self,
+        job_repo: AbstractRepository,
+        max_attempts: int = configs.JOB_MAX_ATTEMPTS,
+    ):
+        self.job_repo = job_repo()
+        self.max_attempts = max_attempts
+        # Будит воркер этого процесса сразу после постановки задачи,
+        # не дожидаясь очередного опроса таблицы
+        self.wakeup = asyncio.Event()
+
+    async def enqueue(self, kind: str, payload: dict, delay: float = 0) -> JobRead:
+        job = await self.job_repo.enqueue(kind, payload, self.max_attempts, delay)
+        self.wakeup.set()
+        return job
+
+
+class JobWorker:
+    """Разбирает очередь задач из таблицы jobs в фоне.
+
+    Одновременно выполняется не больше concurrency задач. Упавшая задача
+    повторяется с экспоненциальной задержкой, пока не кончатся попытки.
+    """
+
+    def __init__(
+        self,
+        jobs: JobService,
+        handlers: Dict[str, JobHandler],
+        concurrency: int = configs.JOB_WORKER_CONCURRENCY,
+        poll_interval: float = configs.JOB_POLL_INTERVAL,
+        lock_timeout: float = configs.JOB_LOCK_TIMEOUT,
+        retry_backoff: float = configs.JOB_RETRY_BACKOFF,
+    ):
+        self.jobs = jobs
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lock_timeout = lock_timeout
+        self.retry_backoff = retry_backoff
+        self._running: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10):
+        self._stopping = True
+        self.jobs.wakeup.set()
+        if self._task is not None:
+            await self._task
+        if self._running:
+            # Незавершённые задачи останутся в running и будут подобраны
+            # повторно после lock_timeout
+            _, pending = await asyncio.wait(self._running, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _run(self):
+        wakeup = self.jobs.wakeup
+        while not self._stopping:
+            wakeup.clear()
+            free = self.concurrency - len(self._running)
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = await self.jobs.job_repo.claim(free, self.lock_timeout)
+                except Exception as e:
+                    logger.error("Failed to claim jobs: %s", e)
+            for job in claimed:
+                task = asyncio.create_task(self._execute(job))
+                self._running.add(task)
+                task.add_done_callback(self._job_done)
+            if claimed and len(claimed) == free:
+                continue
+            try:
+                await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _job_done(self, task: asyncio.Task):
+        self._running.discard(task)
+        # Освободился слот - можно забирать следующую задачу
+        self.jobs.wakeup.set()
+
+    async def _execute(self, job: JobRead):
+        job_repo = self.jobs.job_repo
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for job kind {job.kind}")
+            await handler(job.payload)
+        except Exception as e:
+            logger.error("Job %s (%s) failed: %s", job.id, job.kind, e)
+            retry_in = self.retry_backoff * 2 ** (job.attempts - 1)
+            try:
+                await job_repo.fail(job, repr(e), retry_in)
+            except Exception as error:
+                logger.error("Failed to record job %s failure: %s", job.id, error)
+            return
+
+        try:
+            await job_repo.complete(job.id)
+        except Exception as e:
+            logger.error("Failed to complete job %s: %s", job.id, e)
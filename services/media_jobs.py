@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from config import configs
+from services.job_service import (
+    DELETE_OBJECT,
+    EXTRACT_METADATA,
+    GENERATE_RENDITIONS,
+    VERIFY_UPLOAD,
+    JobHandler,
+)
+from services.minio_service import MinioService
+from services.storage_service import media_cache_key
+from utils.cache import AbstractCache, NullCache
+from utils.images import (
+    FORMAT_CONTENT_TYPES,
+    Image,
+    RenditionSpec,
+    parse_renditions,
+    read_image_size,
+    render_renditions,
+)
+from utils.repository import AbstractRepository
+
+logger = logging.getLogger(__name__)
+
+# Размеры изображения почти всегда есть в первых килобайтах файла
+METADATA_PROBE_SIZE = 64 * 1024
+
+
+class MediaJobs:
+    """Обработчики фоновых задач, связанных с медиафайлами."""
+
+    def __init__(
+        self,
+        storage_repo: AbstractRepository,
+        minio_service: MinioService,
+        cache: Optional[AbstractCache] = None,
+        executor: Optional[Executor] = None,
+        renditions: Optional[List[RenditionSpec]] = None,
+    ):
+        self.storage_repo = storage_repo()
+        self.minio_service = minio_service
+        self.cache = cache or NullCache()
+        # Пул процессов для декодирования изображений
+        self.executor = executor
+        if renditions is None:
+            renditions = parse_renditions(configs.RENDITIONS)
+        self.renditions = renditions
+
+    def handlers(self) -> Dict[str, JobHandler]:
+        return {
+            EXTRACT_METADATA: self.extract_metadata,
+            GENERATE_RENDITIONS: self.generate_renditions,
+            DELETE_OBJECT: self.delete_object,
+            VERIFY_UPLOAD: self.verify_upload,
+        }
+
+    async def extract_metadata(self, payload: dict):
+        if Image is None:
+            logger.warning("Pillow is not installed, metadata extraction skipped")
+            return
+
+        key = payload["key"]
+        data = await self.minio_service.read_object(key, METADATA_PROBE_SIZE)
+        # Разбор изображения выполняется в потоке, чтобы не блокировать цикл
+        size = await asyncio.to_thread(read_image_size, data)
+        if (
+            size is None
+            and len(data) >= METADATA_PROBE_SIZE
+            and await self._is_image_source(key)
+        ):
+            data = await self.minio_service.read_object(key)
+            size = await asyncio.to_thread(read_image_size, data)
+        if size is None:
+            logger.warning("Could not read image size of %s", key)
+            return
+
+        width, height = size
+        await self._update_media(payload["id"], width=width, height=height)
+
+    async def generate_renditions(self, payload: dict):
+        if Image is None:
+            logger.warning("Pillow is not installed, renditions skipped")
+            return
+        if not self.renditions:
+            return
+
+        key = payload["key"]
+        if not await self._is_image_source(key):
+            return
+        data = await self.minio_service.read_object(key)
+        loop = asyncio.get_running_loop()
+        size, renditions = await loop.run_in_executor(
+            self.executor,
+            render_renditions,
+            data,
+            self.renditions,
+            configs.RENDITION_QUALITY,
+        )
+        if size is None:
+            logger.warning("Could not decode image %s", key)
+            return
+
+        # Ключи копий выводятся из ключа оригинала, повтор задачи их перезапишет
+        stem, _ = os.path.splitext(key)
+        stored = {}
+        for rendition in renditions:
+            rendition_key = f"renditions/{stem}/{rendition.name}.{rendition.format}"
+            await self.minio_service.put_object(
+                rendition_key,
+                rendition.content,
+                FORMAT_CONTENT_TYPES[rendition.format],
+            )
+            stored[rendition.name] = {
+                "url": self.minio_service.media_url(rendition_key),
+                "width": rendition.width,
+                "height": rendition.height,
+            }
+
+        width, height = size
+        await self._update_media(
+            payload["id"], width=width, height=height, renditions=stored
+        )
+
+    async def _is_image_source(self, key: str) -> bool:
+        # Оригинал читается в память целиком и копируется в процесс пула,
+        # поэтому не-изображения и слишком большие файлы пропускаются до чтения
+        head = await self.minio_service.head_object(key)
+        if head is None:
+            return False
+        if not head.get("ContentType", "").startswith("image/"):
+            logger.info("Skipping %s: not an image (%s)", key, head.get("ContentType"))
+            return False
+        if head["ContentLength"] > configs.RENDITION_MAX_SOURCE_SIZE:
+            logger.info("Skipping %s: %s bytes", key, head["ContentLength"])
+            return False
+        return True
+
+    async def _update_media(self, id: int, **values):
+        try:
+            await self.storage_repo.update_one(id, **values)
+        except HTTPException as e:
+            # Запись успели удалить - обновлять нечего
+            if e.status_code != 404:
+                raise
+        await self.cache.delete(media_cache_key(id))
+
+    async def verify_upload(self, payload: dict):
+        # SHA-256 multipart-загрузки заявлен клиентом: запись с чужим
+        # хэшем заняла бы его и отклоняла бы настоящие загрузки как дубли
+        key = payload["key"]
+        content_hash = await self.minio_service.object_sha256(key)
+        if content_hash == payload["sha256"]:
+            return
+        logger.warning("Uploaded object %s does not match its SHA-256", key)
+        try:
+            await self.storage_repo.delete_one(payload["id"])
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+        await self.cache.delete(media_cache_key(payload["id"]))
+        await self.delete_object({"key": key})
+
+    async def delete_object(self, payload: dict):
+        key = payload["key"]
+        # За время ожидания объект могла занять запись параллельной загрузки
+        if await self.storage_repo.get_one_by(
+            meme_url=self.minio_service.media_url(key)
+        ):
+            return
+        await self.minio_service.delete_object(key)
@@ -1,80 +1,412 @@
+import asyncio
+import base64
+import hashlib
 import logging
+import math
 import os
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
 
-import httpx
 from dotenv import load_dotenv
+from botocore.exceptions import ClientError
 from fastapi import HTTPException, UploadFile
 
-from storage.minio_client import get_minio_client
+from config import configs
+from storage.minio_client import create_minio_client
+from utils.cache import AbstractCache
+from utils.metrics import UPLOAD_BYTES, observe_stage, timed
+from utils.streaming import PartReader, iter_upload_file
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT")
 MINIO_PATH = os.getenv("MINIO_PATH")
 MINIO_ROOT_USER = os.getenv("MINIO_ROOT_USER")
 MINIO_ROOT_PASSWORD = os.getenv("MINIO_ROOT_PASSWORD")
 BUCKET_NAME = os.getenv("MINIO_DEFAULT_BUCKETS")
 
+# S3 не принимает части multipart upload меньше 5 МБ (кроме последней)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class StoredObject(NamedTuple):
+    key: str
+    url: str
+    sha256: str
+    size: int
+    # False, если такой же файл уже лежал в хранилище и запись не понадобилась
+    created: bool
+
 
 class MinioService:
-    def __init__(self, minio_client):
+    def __init__(
+        self,
+        minio_client,
+        presign_client=None,
+        url_cache: Optional[AbstractCache] = None,
+    ):
         self.minio_client = minio_client
+        # Клиент для подписи URL, которые уходят пользователям
+        self.presign_client = presign_client or minio_client
+        # Кэш подписанных GET-ссылок по ключу объекта
+        self.url_cache = url_cache
+        self.part_size = max(configs.MINIO_UPLOAD_PART_SIZE, MIN_PART_SIZE)
 
-    async def upload_file(self, file: UploadFile) -> str:
-        # Чтение данных файла
-        content = await file.read()
-        if not content:
-            logging.error("Uploaded file is empty")
-            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    @staticmethod
+    def media_url(key: str) -> str:
+        return f"{MINIO_PATH}/{BUCKET_NAME}/{key}"
 
-        logging.info(f"File size: {len(content)} bytes")
+    @staticmethod
+    def key_from_url(url: str) -> Optional[str]:
+        prefix = MinioService.media_url("")
+        if not url.startswith(prefix):
+            return None
+        return url[len(prefix) :]
 
-        # Получение названия и расширения файла из его имени
-        file_name, file_extension = os.path.splitext(file.filename)
+    @staticmethod
+    def content_key(sha256: str, file_name: str) -> str:
+        # Ключ по содержимому: одинаковые файлы попадают в один объект
+        _, file_extension = os.path.splitext(file_name)
+        return f"{sha256}{file_extension.lower()}"
 
-        new_file_name = f"{file_name}{file_extension}"
-        media_url = f"{MINIO_PATH}/{BUCKET_NAME}/{new_file_name}"
-        logging.info(f"Generated url: {media_url}")
-        logging.info(f"Generated file name: {new_file_name}")
+    async def upload_file(self, file: UploadFile) -> StoredObject:
+        return await self.upload_stream(
+            iter_upload_file(file), file.filename, file.content_type
+        )
+
+    @timed("s3.upload")
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_name: str,
+        content_type: Optional[str] = None,
+    ) -> StoredObject:
+        reader = PartReader(chunks, self.part_size)
+        first_part = await reader.read()
+        if not first_part:
+            logger.error("Uploaded file is empty")
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
 
         # Установка типа содержимого
-        content_type = file.content_type or "image/jpeg"
-        logging.info(f"Content type: {content_type}")
+        content_type = content_type or "image/jpeg"
 
-        # Загрузка файла в MinIO с использованием presigned URL
+        # Хэш считается по ходу чтения, файл целиком в памяти не держится
+        hasher = hashlib.sha256(first_part)
         try:
-            async with self.minio_client as client:
-                # Генерируем pre-signed URL для загрузки
-                presigned_url = await client.generate_presigned_url(
-                    "put_object",
-                    Params={
-                        "Bucket": BUCKET_NAME,
-                        "Key": new_file_name,
-                        "ContentType": content_type,
-                    },
-                    ExpiresIn=3600,
-                )
-
-            # Выполняем запрос PUT к presigned URL
-            async with httpx.AsyncClient() as http_client:
-                headers = {"Content-Type": content_type}
-                response = await http_client.put(
-                    presigned_url, headers=headers, content=content
+            if reader.exhausted:
+                # Файл целиком поместился в одну часть: хэш известен до записи
+                size = len(first_part)
+                key = self.content_key(hasher.hexdigest(), file_name)
+                created = await self.head_object(key) is None
+                if created:
+                    await self.put_object(key, first_part, content_type)
+                    UPLOAD_BYTES.labels("stream").inc(size)
+            else:
+                # Хэш станет известен только в конце, поэтому файл сначала
+                # загружается во временный ключ
+                temp_key = f"tmp/{uuid.uuid4().hex}"
+                size = await self._put_multipart(
+                    reader, first_part, temp_key, content_type, hasher
                 )
-                response.raise_for_status()
+                UPLOAD_BYTES.labels("stream").inc(size)
+                try:
+                    key = self.content_key(hasher.hexdigest(), file_name)
+                    created = await self.head_object(key) is None
+                    if created:
+                        # Копирование выполняется на стороне MinIO
+                        with observe_stage("s3.copy_object"):
+                            await self.minio_client.copy_object(
+                                Bucket=BUCKET_NAME,
+                                Key=key,
+                                CopySource={"Bucket": BUCKET_NAME, "Key": temp_key},
+                            )
+                finally:
+                    await self.delete_object(temp_key)
 
-            logging.info("File uploaded successfully")
-            return media_url
+            media_url = self.media_url(key)
+            logger.debug(
+                "Stored %s (%s, %s bytes, created=%s)", key, content_type, size, created
+            )
+            return StoredObject(key, media_url, hasher.hexdigest(), size, created)
         except Exception as e:
-            logging.error(f"MinIO upload error: {str(e)}")
+            logger.error("MinIO upload error: %s", e)
             raise HTTPException(
                 status_code=504, detail="Failed to upload file to storage"
             )
 
+    @timed("s3.put_object")
+    async def put_object(self, key: str, content: bytes, content_type: str):
+        await self.minio_client.put_object(
+            Bucket=BUCKET_NAME, Key=key, Body=content, ContentType=content_type
+        )
+
+    @timed("s3.multipart_upload")
+    async def _put_multipart(
+        self,
+        reader: PartReader,
+        first_part: bytes,
+        key: str,
+        content_type: str,
+        hasher=None,
+    ) -> int:
+        upload = await self.minio_client.create_multipart_upload(
+            Bucket=BUCKET_NAME, Key=key, ContentType=content_type
+        )
+        upload_id = upload["UploadId"]
+
+        # Семафор ограничивает число частей в полёте, а значит и память:
+        # не больше (MINIO_UPLOAD_MAX_CONCURRENCY + 1) * part_size на загрузку
+        semaphore = asyncio.Semaphore(configs.MINIO_UPLOAD_MAX_CONCURRENCY)
+        parts = []
+        tasks = []
+
+        async def upload_part(number: int, body: bytes):
+            try:
+                response = await self.minio_client.upload_part(
+                    Bucket=BUCKET_NAME,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=body,
+                )
+                parts.append({"PartNumber": number, "ETag": response["ETag"]})
+            finally:
+                semaphore.release()
+
+        size = 0
+        try:
+            part, number = first_part, 1
+            while part:
+                await semaphore.acquire()
+                for task in tasks:
+                    if task.done() and task.exception():
+                        raise task.exception()
+                tasks.append(asyncio.create_task(upload_part(number, part)))
+                size += len(part)
+                number += 1
+                part = await reader.read()
+                if hasher is not None:
+                    hasher.update(part)
+            await asyncio.gather(*tasks)
+
+            parts.sort(key=lambda p: p["PartNumber"])
+            await self.minio_client.complete_multipart_upload(
+                Bucket=BUCKET_NAME,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+            return size
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.minio_client.abort_multipart_upload(
+                Bucket=BUCKET_NAME, Key=key, UploadId=upload_id
+            )
+            raise
+
+    @timed("s3.create_direct_upload")
+    async def create_direct_upload(
+        self,
+        file_name: str,
+        content_type: str,
+        size: int,
+        sha256: str,
+        expires_in: int = configs.PRESIGNED_URL_EXPIRES,
+    ) -> dict:
+        """Готовит загрузку клиентом напрямую в MinIO.
+
+        Ключ объекта генерируется сервером, чтобы клиент не мог
+        перезаписать чужой файл. Небольшой файл загружается сразу под
+        ключом по содержимому: x-amz-checksum-sha256 входит в подпись,
+        и MinIO сам сверяет контрольную сумму при записи.
+        """
+        if size <= self.part_size:
+            key = self.content_key(sha256, file_name)
+            checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+            upload_url = await self.presign_client.generate_presigned_url(
+                "put_object",
+                Params={
+                    "Bucket": BUCKET_NAME,
+                    "Key": key,
+                    "ContentType": content_type,
+                    "ChecksumSHA256": checksum,
+                },
+                ExpiresIn=expires_in,
+            )
+            return {"key": key, "upload_url": upload_url}
+
+        _, file_extension = os.path.splitext(file_name)
+        key = f"{uuid.uuid4().hex}{file_extension}"
+        upload = await self.minio_client.create_multipart_upload(
+            Bucket=BUCKET_NAME, Key=key, ContentType=content_type
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+        for number in range(1, math.ceil(size / self.part_size) + 1):
+            upload_url = await self.presign_client.generate_presigned_url(
+                "upload_part",
+                Params={
+                    "Bucket": BUCKET_NAME,
+                    "Key": key,
+                    "UploadId": upload_id,
+                    "PartNumber": number,
+                },
+                ExpiresIn=expires_in,
+            )
+            parts.append({"part_number": number, "upload_url": upload_url})
+        return {
+            "key": key,
+            "upload_id": upload_id,
+            "part_size": self.part_size,
+            "parts": parts,
+        }
+
+    @timed("s3.complete_direct_upload")
+    async def complete_direct_upload(self, key: str, upload_id: str, parts: List):
+        await self.minio_client.complete_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": part.part_number, "ETag": part.etag}
+                    for part in sorted(parts, key=lambda p: p.part_number)
+                ]
+            },
+        )
+
+    @timed("s3.head_object")
+    async def head_object(self, key: str) -> Optional[dict]:
+        try:
+            return await self.minio_client.head_object(Bucket=BUCKET_NAME, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    @timed("s3.get_object")
+    async def open_object(
+        self,
+        key: str,
+        range: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[datetime] = None,
+    ) -> dict:
+        """GET объекта без чтения тела: Body отдаётся вызывающему потоком."""
+        params = {"Bucket": BUCKET_NAME, "Key": key}
+        if range:
+            params["Range"] = range
+        if if_none_match:
+            params["IfNoneMatch"] = if_none_match
+        if if_modified_since:
+            params["IfModifiedSince"] = if_modified_since
+        try:
+            return await self.minio_client.get_object(**params)
+        except ClientError as e:
+            metadata = e.response.get("ResponseMetadata", {})
+            status = metadata.get("HTTPStatusCode")
+            headers = metadata.get("HTTPHeaders", {})
+            if status == 304:
+                raise HTTPException(
+                    status_code=304, headers={"ETag": headers.get("etag", "")}
+                )
+            if status == 416:
+                raise HTTPException(
+                    status_code=416,
+                    detail="Requested range not satisfiable.",
+                    headers={"Content-Range": headers.get("content-range", "")},
+                )
+            if status == 412:
+                raise HTTPException(status_code=412, detail="Precondition failed.")
+            if status == 404 or e.response["Error"]["Code"] == "NoSuchKey":
+                raise HTTPException(status_code=404, detail="Object not found.")
+            raise
+
+    async def presign_get_url(
+        self, key: str, expires_in: int = configs.PRESIGNED_GET_EXPIRES
+    ) -> str:
+        urls = await self.presign_get_urls([key], expires_in)
+        return urls[key]
+
+    @timed("s3.presign")
+    async def presign_get_urls(
+        self, keys: List[str], expires_in: int = configs.PRESIGNED_GET_EXPIRES
+    ) -> Dict[str, str]:
+        """Подписывает GET-ссылки на несколько объектов разом.
+
+        Подпись - это HMAC на CPU, поэтому готовые ссылки берутся из
+        url_cache. Кэш рассчитан на срок PRESIGNED_GET_EXPIRES, ссылки
+        с другим сроком всегда подписываются заново.
+        """
+        use_cache = (
+            self.url_cache is not None and expires_in == configs.PRESIGNED_GET_EXPIRES
+        )
+        urls = {}
+        for key in dict.fromkeys(keys):
+            if use_cache:
+                url = await self.url_cache.get(key)
+                if url is not None:
+                    urls[key] = url
+                    continue
+            url = await self.presign_client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": BUCKET_NAME, "Key": key},
+                ExpiresIn=expires_in,
+            )
+            urls[key] = url
+            if use_cache:
+                await self.url_cache.set(key, url)
+        return urls
+
+    @timed("s3.read_object")
+    async def read_object(self, key: str, length: Optional[int] = None) -> bytes:
+        params = {"Bucket": BUCKET_NAME, "Key": key}
+        if length is not None:
+            # Только начало объекта, например заголовок изображения
+            params["Range"] = f"bytes=0-{length - 1}"
+        response = await self.minio_client.get_object(**params)
+        async with response["Body"] as body:
+            return await body.read()
+
+    @timed("s3.head_object")
+    async def stored_sha256(self, key: str) -> Optional[str]:
+        """SHA-256 объекта, проверенный MinIO при записи, если он есть."""
+        head = await self.minio_client.head_object(
+            Bucket=BUCKET_NAME, Key=key, ChecksumMode="ENABLED"
+        )
+        checksum = head.get("ChecksumSHA256")
+        # У multipart-объектов контрольная сумма составная ("...-N") и не подходит
+        if checksum and "-" not in checksum:
+            return base64.b64decode(checksum).hex()
+        return None
+
+    @timed("s3.object_sha256")
+    async def object_sha256(self, key: str) -> str:
+        checksum = await self.stored_sha256(key)
+        if checksum is not None:
+            return checksum
+
+        # Иначе объект читается потоком внутри сети, без выхода к клиенту
+        hasher = hashlib.sha256()
+        response = await self.minio_client.get_object(Bucket=BUCKET_NAME, Key=key)
+        async with response["Body"] as body:
+            while chunk := await body.read(configs.UPLOAD_CHUNK_SIZE):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @timed("s3.delete_object")
+    async def delete_object(self, key: str):
+        await self.minio_client.delete_object(Bucket=BUCKET_NAME, Key=key)
+
 
 if __name__ == "__main__":
 
     async def test_upload(file: UploadFile):
-        async for minio_client in get_minio_client():
+        async with create_minio_client() as minio_client:
             minio_service = MinioService(minio_client)
             return await minio_service.upload_file(file)
@@ -1,42 +1,457 @@
+import asyncio
+import logging
+from typing import AsyncIterator, List, Optional
+
+from botocore.exceptions import ClientError
 from fastapi import UploadFile, HTTPException
 
-from schemas.media_schemas import MediaRead
+from config import configs
+from schemas.media_schemas import (
+    MediaBatchDeleted,
+    MediaPage,
+    MediaRead,
+    MediaUploadComplete,
+    MediaUploadCreate,
+    MediaUploadTicket,
+)
+from utils.cache import AbstractCache, NullCache
+from utils.metrics import UPLOAD_BYTES
+from utils.pagination import decode_cursor, encode_cursor
 from utils.repository import AbstractRepository
-from .minio_service import MinioService
+from utils.tokens import InvalidToken, load_token, sign_token
+from .job_service import (
+    DELETE_OBJECT,
+    EXTRACT_METADATA,
+    GENERATE_RENDITIONS,
+    VERIFY_UPLOAD,
+    JobService,
+)
+from .minio_service import MinioService, StoredObject
+
+logger = logging.getLogger(__name__)
+
+
+def media_cache_key(id: int) -> str:
+    return f"media:{id}"
 
 
 class StorageService:
-    def __init__(self, storage_repo: AbstractRepository, minio_service: MinioService):
+    def __init__(
+        self,
+        storage_repo: AbstractRepository,
+        minio_service: Optional[MinioService] = None,
+        cache: Optional[AbstractCache] = None,
+        jobs: Optional[JobService] = None,
+    ):
         self.storage_repo: AbstractRepository = storage_repo()
         self.minio_service = minio_service
+        self.cache = cache or NullCache()
+        self.jobs = jobs
 
     async def add_single_media(
         self, media_data: UploadFile, media_description: str
     ) -> MediaRead:
-        media_url = await self.minio_service.upload_file(media_data)
+        await self._check_description_free(media_description)
+        stored = await self.minio_service.upload_file(media_data)
+        return await self._add_stored_media(stored, media_description)
+
+    async def add_single_media_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_name: str,
+        content_type: Optional[str],
+        media_description: str,
+    ) -> MediaRead:
+        await self._check_description_free(media_description)
+        stored = await self.minio_service.upload_stream(chunks, file_name, content_type)
+        return await self._add_stored_media(stored, media_description)
+
+    async def add_media_batch(
+        self, media_data: List[UploadFile], media_descriptions: List[str]
+    ) -> List[MediaRead]:
+        if len(media_data) != len(media_descriptions):
+            raise HTTPException(
+                status_code=400, detail="Each file needs exactly one description."
+            )
+        if len(media_data) > configs.BATCH_UPLOAD_MAX_FILES:
+            raise HTTPException(status_code=413, detail="Too many files in batch.")
+        if len(set(media_descriptions)) != len(media_descriptions):
+            raise HTTPException(
+                status_code=409,
+                detail="Unique constraint violated: data already exists.",
+            )
+        # Все описания проверяются одним запросом; гонку между проверкой
+        # и вставкой закрывает ограничение уникальности
+        if await self.storage_repo.get_many_by("meme_description", media_descriptions):
+            raise HTTPException(
+                status_code=409,
+                detail="Unique constraint violated: data already exists.",
+            )
+
+        # Загрузки в MinIO идут параллельно, но не больше BATCH_UPLOAD_CONCURRENCY
+        semaphore = asyncio.Semaphore(configs.BATCH_UPLOAD_CONCURRENCY)
+
+        async def upload(file: UploadFile) -> StoredObject:
+            async with semaphore:
+                return await self.minio_service.upload_file(file)
+
+        # Ждём все загрузки, чтобы при ошибке убрать уже записанные объекты
+        results = await asyncio.gather(
+            *(upload(file) for file in media_data), return_exceptions=True
+        )
+        stored = [item for item in results if isinstance(item, StoredObject)]
+        try:
+            for item in results:
+                if isinstance(item, BaseException):
+                    raise item
+            media = await self.storage_repo.add_many(
+                [
+                    {
+                        "meme_url": item.url,
+                        "meme_description": media_description,
+                        "content_hash": item.sha256,
+                    }
+                    for item, media_description in zip(stored, media_descriptions)
+                ]
+            )
+        except BaseException:
+            for item in stored:
+                if item.created:
+                    await self._discard_object(item.key)
+            raise
+        for item, row in zip(stored, media):
+            await self._enqueue_processing(row.id, item.key)
+        return [
+            MediaRead(
+                id=item.id,
+                meme_url=item.meme_url,
+                meme_description=item.meme_description,
+            )
+            for item in media
+        ]
+
+    async def _check_description_free(self, media_description: str):
+        # Проверка по индексу дешевле, чем загрузка файла, которую потом
+        # отклонит ограничение уникальности
+        if await self.storage_repo.get_one_by(meme_description=media_description):
+            raise HTTPException(
+                status_code=409,
+                detail="Unique constraint violated: data already exists.",
+            )
+
+    async def _enqueue(self, kind: str, payload: dict, delay: float = 0) -> bool:
+        # Фоновая работа не должна ломать уже выполненный запрос
+        if self.jobs is None:
+            return False
+        try:
+            await self.jobs.enqueue(kind, payload, delay)
+            return True
+        except Exception as e:
+            logger.error("Failed to enqueue %s job: %s", kind, e)
+            return False
+
+    async def _enqueue_processing(self, id: int, key: str):
+        # Копии изображения дают и размеры, отдельное чтение метаданных не нужно
+        kind = GENERATE_RENDITIONS if configs.RENDITIONS else EXTRACT_METADATA
+        await self._enqueue(kind, {"id": id, "key": key})
+
+    async def _discard_object(self, key: str):
+        # Ключ по содержимому общий для одинаковых файлов: проигравшая гонку
+        # загрузка не должна удалить объект, на который ссылается запись
+        # победителя. Задача удаления повторяет проверку перед запуском
+        try:
+            if await self.storage_repo.get_one_by(
+                meme_url=self.minio_service.media_url(key)
+            ):
+                return
+        except Exception as e:
+            logger.error("Failed to check references to %s: %s", key, e)
+            return
+        # Удаление откладывается в очередь, чтобы не задерживать ответ;
+        # если очередь недоступна, объект удаляется сразу
+        if await self._enqueue(
+            DELETE_OBJECT, {"key": key}, delay=configs.ORPHAN_DELETE_DELAY
+        ):
+            return
+        try:
+            await self.minio_service.delete_object(key)
+        except Exception as e:
+            logger.error("Failed to delete orphaned object %s: %s", key, e)
+
+    async def _add_stored_media(
+        self, stored: StoredObject, media_description: str
+    ) -> MediaRead:
+        try:
+            media = await self._add_media_row(
+                stored.url, media_description, stored.sha256
+            )
+        except BaseException:
+            # Объект, который уже был в хранилище до нас, не удаляется
+            if stored.created:
+                await self._discard_object(stored.key)
+            raise
+        await self._enqueue_processing(media.id, stored.key)
+        return media
+
+    async def _add_media_row(
+        self, media_url: str, media_description: str, content_hash: str
+    ):
         media = await self.storage_repo.add_one(
-            {"meme_url": media_url, "meme_description": media_description}
+            {
+                "meme_url": media_url,
+                "meme_description": media_description,
+                "content_hash": content_hash,
+            }
         )
         return MediaRead(
-            id=media.id, meme_url=media.meme_url, meme_description=media.meme_description
+            id=media.id,
+            meme_url=media.meme_url,
+            meme_description=media.meme_description,
+        )
+
+    async def create_upload(self, upload: MediaUploadCreate) -> MediaUploadTicket:
+        if upload.size > configs.DIRECT_UPLOAD_MAX_SIZE:
+            raise HTTPException(status_code=413, detail="File is too large.")
+        await self._check_description_free(upload.meme_description)
+        if await self.storage_repo.get_one_by(content_hash=upload.sha256):
+            raise HTTPException(
+                status_code=409,
+                detail="Unique constraint violated: data already exists.",
+            )
+
+        expires_in = configs.PRESIGNED_URL_EXPIRES
+        direct_upload = await self.minio_service.create_direct_upload(
+            upload.file_name,
+            upload.content_type,
+            upload.size,
+            upload.sha256,
+            expires_in,
+        )
+        token = sign_token(
+            {
+                "key": direct_upload["key"],
+                "upload_id": direct_upload.get("upload_id"),
+                "content_type": upload.content_type,
+                "size": upload.size,
+                "meme_description": upload.meme_description,
+                "sha256": upload.sha256,
+            },
+            configs.UPLOAD_TOKEN_SECRET,
+            expires_in,
+        )
+        return MediaUploadTicket(
+            token=token,
+            expires_in=expires_in,
+            upload_url=direct_upload.get("upload_url"),
+            part_size=direct_upload.get("part_size"),
+            parts=direct_upload.get("parts", []),
+        )
+
+    async def complete_upload(
+        self, token: str, upload: MediaUploadComplete
+    ) -> MediaRead:
+        try:
+            ticket = load_token(token, configs.UPLOAD_TOKEN_SECRET)
+        except InvalidToken:
+            raise HTTPException(status_code=400, detail="Invalid upload token.")
+
+        key = ticket["key"]
+        if ticket["upload_id"]:
+            if not upload.parts:
+                raise HTTPException(status_code=400, detail="Upload parts are missing.")
+            try:
+                await self.minio_service.complete_direct_upload(
+                    key, ticket["upload_id"], upload.parts
+                )
+            except ClientError:
+                raise HTTPException(status_code=400, detail="Upload is incomplete.")
+
+        head = await self.minio_service.head_object(key)
+        if head is None:
+            raise HTTPException(status_code=400, detail="Object was not uploaded.")
+        UPLOAD_BYTES.labels("direct").inc(head["ContentLength"])
+        if (
+            head["ContentLength"] != ticket["size"]
+            or head.get("ContentType") != ticket["content_type"]
+        ):
+            await self._discard_object(key)
+            raise HTTPException(
+                status_code=400, detail="Uploaded object does not match the upload."
+            )
+
+        # Одиночный PUT MinIO уже сверил с подписанной контрольной суммой.
+        # У multipart её нет: объект до 1 ГиБ дочитывает фоновая задача,
+        # а не запрос. Без очереди остаётся только прочитать его здесь
+        content_hash = ticket["sha256"]
+        checksum = await self.minio_service.stored_sha256(key)
+        if checksum is None and self.jobs is None:
+            checksum = await self.minio_service.object_sha256(key)
+        if checksum is not None and checksum != content_hash:
+            await self._discard_object(key)
+            raise HTTPException(
+                status_code=400, detail="Uploaded object does not match the upload."
+            )
+
+        media_url = self.minio_service.media_url(key)
+        existing = await self.storage_repo.get_one_by(content_hash=content_hash)
+        if existing:
+            # Ключ по содержимому может принадлежать существующей записи
+            if existing.meme_url != media_url:
+                await self._discard_object(key)
+            raise HTTPException(
+                status_code=409,
+                detail="Unique constraint violated: data already exists.",
+            )
+
+        try:
+            media = await self._add_media_row(
+                media_url, ticket["meme_description"], content_hash
+            )
+        except BaseException:
+            await self._discard_object(key)
+            raise
+        if checksum is None:
+            await self._enqueue(
+                VERIFY_UPLOAD, {"id": media.id, "key": key, "sha256": content_hash}
+            )
+        await self._enqueue_processing(media.id, key)
+        return media
+
+    async def get_all_media(
+        self, skip: int = 0, limit: int = 10, cursor: Optional[str] = None
+    ) -> MediaPage:
+        after_id = decode_cursor(cursor).get("id")
+        if cursor and not isinstance(after_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+        # Лишняя строка показывает, есть ли следующая страница
+        all_media = await self.storage_repo.get_all(
+            skip=skip, limit=limit + 1, after_id=after_id
         )
+        next_cursor = None
+        if len(all_media) > limit:
+            all_media = all_media[:limit]
+            next_cursor = encode_cursor(id=all_media[-1].id)
+        all_media = await self._presign_media(all_media)
+        return MediaPage(items=all_media, count=len(all_media), next_cursor=next_cursor)
+
+    async def search_media(
+        self, query: str, limit: int = 10, cursor: Optional[str] = None
+    ) -> MediaPage:
+        after = None
+        if cursor:
+            values = decode_cursor(cursor)
+            if not isinstance(values.get("rank"), float) or not isinstance(
+                values.get("id"), int
+            ):
+                raise HTTPException(status_code=400, detail="Invalid cursor.")
+            after = (values["rank"], values["id"])
+
+        found = await self.storage_repo.search(query, limit=limit + 1, after=after)
+        next_cursor = None
+        if len(found) > limit:
+            found = found[:limit]
+            last_media, last_rank = found[-1]
+            next_cursor = encode_cursor(rank=last_rank, id=last_media.id)
+        items = await self._presign_media([media for media, _ in found])
+        return MediaPage(items=items, count=len(items), next_cursor=next_cursor)
+
+    async def _presign_media(self, items: List[MediaRead]) -> List[MediaRead]:
+        """В режиме presigned заменяет ссылки на подписанные.
 
-    async def get_all_media(self, skip: int = 0, limit: int = 10):
-        all_media = await self.storage_repo.get_all(skip=skip, limit=limit)
-        return all_media
+        Все ссылки страницы подписываются одним пакетом; в кэше записей
+        остаются исходные URL.
+        """
+        if configs.MEDIA_URL_MODE != "presigned" or self.minio_service is None:
+            return items
+
+        key_from_url = self.minio_service.key_from_url
+        keys = []
+        for media in items:
+            keys.append(key_from_url(media.meme_url))
+            keys.extend(key_from_url(r.url) for r in media.renditions.values())
+        urls = await self.minio_service.presign_get_urls([k for k in keys if k])
+
+        def sign(url: str) -> str:
+            return urls.get(key_from_url(url), url)
+
+        return [
+            media.model_copy(
+                update={
+                    "meme_url": sign(media.meme_url),
+                    "renditions": {
+                        name: rendition.model_copy(update={"url": sign(rendition.url)})
+                        for name, rendition in media.renditions.items()
+                    },
+                }
+            )
+            for media in items
+        ]
+
+    async def get_media_key(self, id: int, rendition: Optional[str] = None) -> str:
+        media = await self._get_media(id)
+        url = media.meme_url
+        if rendition:
+            if rendition not in media.renditions:
+                raise HTTPException(status_code=404, detail="Rendition not found.")
+            url = media.renditions[rendition].url
+        # Ключ объекта восстанавливается из URL, отдельной колонки для него нет
+        key = self.minio_service.key_from_url(url)
+        if key is None:
+            raise HTTPException(status_code=404, detail="Object not found.")
+        return key
+
+    async def get_media_batch(self, ids: List[int]) -> MediaPage:
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        for id in ids:
+            cached = await self.cache.get(media_cache_key(id))
+            if cached is not None:
+                found[id] = MediaRead(**cached)
+
+        # Промахи кэша читаются из БД одним запросом
+        missing = [id for id in ids if id not in found]
+        if missing:
+            for media in await self.storage_repo.get_many_by_ids(missing):
+                found[media.id] = media
+                await self.cache.set(media_cache_key(media.id), media.model_dump())
+
+        items = await self._presign_media([found[id] for id in ids if id in found])
+        return MediaPage(items=items, count=len(items))
 
     async def get_single_media(self, id: int):
+        media = await self._get_media(id)
+        items = await self._presign_media([media])
+        return items[0]
+
+    async def _get_media(self, id: int) -> MediaRead:
+        cached = await self.cache.get(media_cache_key(id))
+        if cached is not None:
+            return MediaRead(**cached)
+
         media = await self.storage_repo.get_one_by_id(id)
         if not media:
             raise HTTPException(status_code=404, detail="Object not found.")
+        await self.cache.set(media_cache_key(id), media.model_dump())
         return media
 
     async def update_single_media(self, id: int, data: dict):
         media = await self.storage_repo.update_one(id, **data)
+        await self.cache.delete(media_cache_key(id))
         if not media:
             raise HTTPException(status_code=404, detail="Object not found.")
         return media
 
     async def delete_single_media(self, id):
         media = await self.storage_repo.delete_one(id)
+        await self.cache.delete(media_cache_key(id))
         return media
+
+    async def delete_media_batch(self, ids: List[int]) -> MediaBatchDeleted:
+        ids = list(dict.fromkeys(ids))
+        deleted = await self.storage_repo.delete_many(ids)
+        for id in ids:
+            await self.cache.delete(media_cache_key(id))
+        return MediaBatchDeleted(
+            deleted=sorted(deleted), missing=[id for id in ids if id not in deleted]
+        )
@@ -1,13 +1,15 @@
 import os
+from contextlib import AsyncExitStack
 
+from aiobotocore.config import AioConfig
 from aiobotocore.session import get_session
 from dotenv import load_dotenv
 
+from config import configs
+
 load_dotenv()
 
-MINIO_HOST = os.getenv("MINIO_HOST")
-MINIO_PORT = os.getenv("MINIO_PORT")
-MINIO_ENDPOINT = f"{MINIO_HOST}:{MINIO_PORT}"
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT")
 MINIO_ROOT_USER = os.getenv("MINIO_ROOT_USER")
 MINIO_ROOT_PASSWORD = os.getenv("MINIO_ROOT_PASSWORD")
 BUCKET_NAME = os.getenv("MINIO_DEFAULT_BUCKETS")
@@ -15,11 +17,34 @@ BUCKET_NAME = os.getenv("MINIO_DEFAULT_BUCKETS")
 session = get_session()
 
 
-async def get_minio_client():
-    async with session.create_client(
+def create_minio_client(endpoint_url: str = MINIO_ENDPOINT):
+    """Контекстный менеджер S3-клиента с настраиваемым пулом соединений.
+
+    Клиент создаётся один раз в lifespan storage_app и разделяется
+    всеми запросами.
+    """
+    config = AioConfig(
+        max_pool_connections=configs.MINIO_MAX_POOL_CONNECTIONS,
+        connect_timeout=configs.MINIO_CONNECT_TIMEOUT,
+        read_timeout=configs.MINIO_READ_TIMEOUT,
+        retries={"max_attempts": configs.MINIO_MAX_ATTEMPTS, "mode": "standard"},
+        signature_version="s3v4",
+    )
+    return session.create_client(
         "s3",
-        endpoint_url=MINIO_ENDPOINT,
+        endpoint_url=endpoint_url,
         aws_access_key_id=MINIO_ROOT_USER,
         aws_secret_access_key=MINIO_ROOT_PASSWORD,
-    ) as client:
-        yield client
+        config=config,
+    )
+
+
+async def open_minio_clients(state, stack: AsyncExitStack):
+    minio_client = await stack.enter_async_context(create_minio_client())
+    state.minio_client = minio_client
+    # presigned URL для клиентов подписываются на публичный адрес MinIO
+    state.minio_presign_client = minio_client
+    if configs.MINIO_PUBLIC_ENDPOINT:
+        state.minio_presign_client = await stack.enter_async_context(
+            create_minio_client(configs.MINIO_PUBLIC_ENDPOINT)
+        )
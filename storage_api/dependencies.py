@@ -1,34 +1,108 @@
-from aiobotocore.session import get_session
-from fastapi import Depends
-
-from repositories.storage_repository import StorageRepository
-from services.minio_service import (
-    MinioService,
-    MINIO_ENDPOINT,
-    MINIO_ROOT_USER,
-    MINIO_ROOT_PASSWORD,
+from typing import Optional
+
+from fastapi import Depends, Request
+
+from repositories.job_repository import JobRepository
+from repositories.storage_repository import (
+    InMemoryStorageRepository,
+    SQLiteStorageRepository,
+    StorageRepository,
 )
+from services.job_service import JobService, JobWorker
+from services.media_jobs import MediaJobs
+from services.minio_service import MinioService
 from services.storage_service import StorageService
+from config import configs
+from utils.cache import AbstractCache, build_cache, build_presigned_url_cache
+from utils.repository import AbstractRepository
 
+# Кэш одиночных записей, общий для всех запросов процесса
+media_cache = build_cache()
 
-async def get_minio_client():
-    session = get_session()
-    async with session.create_client(
-        "s3",
-        endpoint_url=MINIO_ENDPOINT,
-        aws_access_key_id=MINIO_ROOT_USER,
-        aws_secret_access_key=MINIO_ROOT_PASSWORD,
-    ) as client:
-        yield client
+# Подписанные GET-ссылки; подпись не зависит от запроса, кэш общий на процесс
+presigned_url_cache = build_presigned_url_cache()
 
 
-def get_storage_repository() -> StorageRepository:
+def build_storage_repository() -> AbstractRepository:
+    if configs.STORAGE_REPOSITORY == "memory":
+        return InMemoryStorageRepository()
+    if configs.STORAGE_REPOSITORY == "sqlite":
+        return SQLiteStorageRepository()
     return StorageRepository()
 
 
+# Один репозиторий на процесс: для memory в нём же хранятся данные
+storage_repository = build_storage_repository()
+
+# Очередь фоновых задач; воркер запускается в lifespan приложения.
+# Очередь построена на SKIP LOCKED, без Postgres она не работает
+job_service = (
+    JobService(JobRepository) if configs.STORAGE_REPOSITORY == "postgres" else None
+)
+
+
+def get_minio_client(request: Request):
+    # Клиенты открывает и закрывает только lifespan приложения
+    minio_client = getattr(request.app.state, "minio_client", None)
+    if minio_client is None:
+        raise RuntimeError("S3 client is not open: storage_app lifespan has not run")
+    return minio_client
+
+
+def get_minio_presign_client(request: Request, minio_client=Depends(get_minio_client)):
+    return request.app.state.minio_presign_client
+
+
+def get_minio_service(
+    minio_client=Depends(get_minio_client),
+    presign_client=Depends(get_minio_presign_client),
+) -> MinioService:
+    return MinioService(minio_client, presign_client, presigned_url_cache)
+
+
+async def get_url_signing_service(request: Request) -> Optional[MinioService]:
+    # Маршрутам чтения S3-клиент нужен только для подписи ссылок
+    if configs.MEDIA_URL_MODE != "presigned":
+        return None
+    minio_client = get_minio_client(request)
+    return MinioService(
+        minio_client, request.app.state.minio_presign_client, presigned_url_cache
+    )
+
+
+def get_storage_repository() -> AbstractRepository:
+    return storage_repository
+
+
+def get_media_cache() -> AbstractCache:
+    return media_cache
+
+
+def get_job_service() -> Optional[JobService]:
+    return job_service
+
+
+def build_job_worker(state, executor=None) -> JobWorker:
+    minio_service = MinioService(
+        state.minio_client, state.minio_presign_client, presigned_url_cache
+    )
+    media_jobs = MediaJobs(storage_repository, minio_service, media_cache, executor)
+    return JobWorker(job_service, media_jobs.handlers())
+
+
 def storage_service(
     storage_repo=Depends(get_storage_repository),
-    minio_client=Depends(get_minio_client),
+    minio_service=Depends(get_minio_service),
+    cache=Depends(get_media_cache),
+    jobs=Depends(get_job_service),
+):
+    return StorageService(storage_repo, minio_service, cache, jobs)
+
+
+def storage_db_service(
+    storage_repo=Depends(get_storage_repository),
+    cache=Depends(get_media_cache),
+    minio_service=Depends(get_url_signing_service),
 ):
-    minio_service = MinioService(minio_client)
-    return StorageService(storage_repo, minio_service)
+    # Для маршрутов, работающих только с БД, S3-клиент не нужен
+    return StorageService(storage_repo, minio_service, cache=cache)
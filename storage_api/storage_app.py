@@ -1,16 +1,89 @@
 import logging
-from typing import Annotated, List
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Annotated, List, Optional
 
-from fastapi import Form, FastAPI, Query
+from fastapi import Form, FastAPI, Query, Request, Response
 from fastapi import UploadFile, File, Depends, HTTPException
+from fastapi.responses import RedirectResponse
 
-from schemas.media_schemas import MediaRead, MediaUpdate
-from .dependencies import storage_service
+from config import configs
+from database.db import engine
+from schemas.media_schemas import (
+    MediaBatchDelete,
+    MediaBatchDeleted,
+    MediaPage,
+    MediaRead,
+    MediaUpdate,
+    MediaUploadComplete,
+    MediaUploadCreate,
+    MediaUploadTicket,
+)
+from .dependencies import (
+    build_job_worker,
+    get_media_cache,
+    job_service,
+    media_cache,
+    presigned_url_cache,
+    storage_db_service,
+    storage_service,
+)
 from services.storage_service import StorageService
+from storage.minio_client import open_minio_clients
+from utils.cache import AbstractCache
+from utils.http_cache import (
+    is_not_modified,
+    model_etag,
+    not_modified,
+    set_cache_headers,
+)
+from utils.log_config import setup_logging
+from utils.metrics import MetricsMiddleware, metrics_response, register_stats
+from utils.streaming import object_response
+from utils.tracing import TracingMiddleware
 
-logging.basicConfig(level=logging.INFO)
+setup_logging("storage_api")
+logger = logging.getLogger(__name__)
 
-storage_app = FastAPI(title="Private service for media")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not configs.UPLOAD_TOKEN_SECRET:
+        # Случайный секрет в каждом процессе ломал бы токены между воркерами
+        raise RuntimeError("UPLOAD_TOKEN_SECRET must be set")
+    async with AsyncExitStack() as stack:
+        await open_minio_clients(app.state, stack)
+        if configs.JOB_WORKER_ENABLED and job_service is not None:
+            # spawn: fork процесса с запущенным циклом событий небезопасен
+            executor = stack.enter_context(
+                ProcessPoolExecutor(
+                    max_workers=configs.RENDITION_PROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            )
+            worker = build_job_worker(app.state, executor)
+            await worker.start()
+            stack.push_async_callback(worker.stop)
+        yield
+
+
+storage_app = FastAPI(title="Private service for media", lifespan=lifespan)
+storage_app.add_middleware(MetricsMiddleware, app_name="storage_api")
+storage_app.add_middleware(TracingMiddleware, service="storage_api")
+
+# Счётчики пула и кэшей читаются в момент опроса /metrics
+CACHE_COUNTERS = ("hits", "misses", "evictions")
+register_stats(
+    "db_pool",
+    lambda: engine.pool.stats(),
+    counters=("checkouts", "timeouts", "wait_seconds"),
+)
+register_stats("media_cache", media_cache.stats, counters=CACHE_COUNTERS)
+register_stats(
+    "presigned_url_cache", presigned_url_cache.stats, counters=CACHE_COUNTERS
+)
 
 
 @storage_app.get("/")
@@ -18,34 +91,126 @@ async def root():
     return "service is working"
 
 
-@storage_app.get("/media", response_model=List[MediaRead])
+@storage_app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+
+@storage_app.get("/cache/stats")
+async def get_cache_stats(cache: Annotated[AbstractCache, Depends(get_media_cache)]):
+    return cache.stats()
+
+
+@storage_app.get("/db/stats")
+async def get_db_stats():
+    return engine.pool.stats()
+
+
+@storage_app.get("/media", response_model=MediaPage)
 async def get_all_media(
-    media_service: Annotated[StorageService, Depends(storage_service)],
+    request: Request,
+    response: Response,
+    media_service: Annotated[StorageService, Depends(storage_db_service)],
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1),
+    limit: int = Query(10, ge=1, le=configs.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    ids: Optional[List[int]] = Query(None, max_length=configs.MAX_PAGE_SIZE),
+):
+    try:
+        if ids:
+            media = await media_service.get_media_batch(ids)
+        else:
+            media = await media_service.get_all_media(
+                skip=skip, limit=limit, cursor=cursor
+            )
+        etag = model_etag(media)
+        if is_not_modified(request, etag):
+            return not_modified(etag, configs.CACHE_CONTROL_MEDIA_LIST)
+        set_cache_headers(response, etag, configs.CACHE_CONTROL_MEDIA_LIST)
+        return media
+    except HTTPException as e:
+        logger.error("HTTPException: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("Unexpected error: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@storage_app.get("/media/search", response_model=MediaPage)
+async def search_media(
+    media_service: Annotated[StorageService, Depends(storage_db_service)],
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=configs.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
 ):
     try:
-        media = await media_service.get_all_media(skip=skip, limit=limit)
+        media = await media_service.search_media(q, limit=limit, cursor=cursor)
         return media
     except HTTPException as e:
-        logging.error(f"HTTPException: {e.detail}")
+        logger.error("HTTPException: %s", e.detail)
         raise e
     except Exception as e:
-        logging.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @storage_app.get("/media/{id}", response_model=MediaRead)
 async def get_single_media(
-    media_service: Annotated[StorageService, Depends(storage_service)], id: int
+    request: Request,
+    response: Response,
+    media_service: Annotated[StorageService, Depends(storage_db_service)],
+    id: int,
 ):
     try:
+        # При попадании в кэш 304 отдаётся без обращения к БД
         media = await media_service.get_single_media(id)
+        etag = model_etag(media)
+        if is_not_modified(request, etag):
+            return not_modified(etag, configs.CACHE_CONTROL_MEDIA_ITEM)
+        set_cache_headers(response, etag, configs.CACHE_CONTROL_MEDIA_ITEM)
         return media
     except HTTPException as e:
         raise e
 
 
+@storage_app.get("/media/{id}/content")
+async def get_media_content(
+    request: Request,
+    media_service: Annotated[StorageService, Depends(storage_service)],
+    id: int,
+    rendition: Optional[str] = Query(None),
+):
+    try:
+        key = await media_service.get_media_key(id, rendition)
+        if configs.MEDIA_CONTENT_MODE == "redirect":
+            # Клиент скачивает файл напрямую из MinIO по короткоживущей ссылке
+            url = await media_service.minio_service.presign_get_url(key)
+            return RedirectResponse(url, status_code=307)
+
+        if_modified_since = None
+        if request.headers.get("if-modified-since"):
+            try:
+                if_modified_since = parsedate_to_datetime(
+                    request.headers["if-modified-since"]
+                )
+            except (TypeError, ValueError):
+                pass
+        s3_object = await media_service.minio_service.open_object(
+            key,
+            range=request.headers.get("range"),
+            if_none_match=request.headers.get("if-none-match"),
+            if_modified_since=if_modified_since,
+        )
+        return object_response(s3_object)
+    except HTTPException as e:
+        if e.status_code != 304:
+            logger.error("HTTPException: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("Unexpected error: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 @storage_app.post("/media", response_model=MediaRead)
 async def upload_single_media(
     media_service: Annotated[StorageService, Depends(storage_service)],
@@ -56,18 +221,104 @@ async def upload_single_media(
         media = await media_service.add_single_media(media_data, media_description)
         return media
     except HTTPException as e:
-        logging.error(f"HTTPException: {e.detail}")
+        logger.error("HTTPException: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("Unexpected error: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@storage_app.post("/media/stream", response_model=MediaRead)
+async def upload_single_media_stream(
+    request: Request,
+    media_service: Annotated[StorageService, Depends(storage_service)],
+    media_description: str = Query(...),
+    file_name: str = Query(...),
+):
+    # Тело запроса - содержимое файла, передаётся в MinIO частями
+    try:
+        media = await media_service.add_single_media_stream(
+            request.stream(),
+            file_name,
+            request.headers.get("content-type"),
+            media_description,
+        )
+        return media
+    except HTTPException as e:
+        logger.error("HTTPException: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("Unexpected error: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@storage_app.post("/media/uploads", response_model=MediaUploadTicket)
+async def create_media_upload(
+    upload: MediaUploadCreate,
+    media_service: Annotated[StorageService, Depends(storage_service)],
+):
+    try:
+        ticket = await media_service.create_upload(upload)
+        return ticket
+    except HTTPException as e:
+        logger.error("HTTPException: %s", e.detail)
         raise e
     except Exception as e:
-        logging.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@storage_app.post("/media/uploads/{token}/complete", response_model=MediaRead)
+async def complete_media_upload(
+    token: str,
+    upload: MediaUploadComplete,
+    media_service: Annotated[StorageService, Depends(storage_service)],
+):
+    try:
+        media = await media_service.complete_upload(token, upload)
+        return media
+    except HTTPException as e:
+        logger.error("HTTPException: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("Unexpected error: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@storage_app.post("/media/batch", response_model=List[MediaRead])
+async def upload_media_batch(
+    media_service: Annotated[StorageService, Depends(storage_service)],
+    media_data: List[UploadFile] = File(...),
+    media_description: List[str] = Form(...),
+):
+    try:
+        media = await media_service.add_media_batch(media_data, media_description)
+        return media
+    except HTTPException as e:
+        logger.error("HTTPException: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("Unexpected error: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@storage_app.delete("/media/batch", response_model=MediaBatchDeleted)
+async def delete_media_batch(
+    media_batch: MediaBatchDelete,
+    media_service: Annotated[StorageService, Depends(storage_db_service)],
+):
+    try:
+        result = await media_service.delete_media_batch(media_batch.ids)
+        return result
+    except HTTPException as e:
+        raise e
+
+
 @storage_app.put("/media/{id}", response_model=MediaRead)
 async def update_single_media(
     id: int,
     media_update: MediaUpdate,
-    media_service: Annotated[StorageService, Depends(storage_service)],
+    media_service: Annotated[StorageService, Depends(storage_db_service)],
 ):
     try:
         media = await media_service.update_single_media(id, media_update.model_dump())
@@ -78,7 +329,7 @@ async def update_single_media(
 
 @storage_app.delete("/media/{id}")
 async def delete_single_media(
-    media_service: Annotated[StorageService, Depends(storage_service)], id: int
+    media_service: Annotated[StorageService, Depends(storage_db_service)], id: int
 ):
     try:
         media = await media_service.delete_single_media(id)
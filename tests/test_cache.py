@@ -0,0 +1,61 @@
+import pytest
+
+from ..utils.cache import InMemoryCache, RedisCache
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+async def test_memory_cache_hit_and_miss():
+    cache = InMemoryCache(ttl=60, max_size=10)
+    assert await cache.get("media:1") is None
+    await cache.set("media:1", {"id": 1})
+    assert await cache.get("media:1") == {"id": 1}
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+async def test_memory_cache_evicts_least_recently_used():
+    cache = InMemoryCache(ttl=60, max_size=2)
+    await cache.set("media:1", 1)
+    await cache.set("media:2", 2)
+    await cache.get("media:1")
+    await cache.set("media:3", 3)
+    assert await cache.get("media:2") is None
+    assert await cache.get("media:1") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+async def test_memory_cache_expires_entries():
+    cache = InMemoryCache(ttl=-1, max_size=10)
+    await cache.set("media:1", 1)
+    assert await cache.get("media:1") is None
+    assert cache.stats()["evictions"] == 1
+
+
+async def test_memory_cache_delete():
+    cache = InMemoryCache(ttl=60, max_size=10)
+    await cache.set("media:1", 1)
+    await cache.delete("media:1")
+    assert await cache.get("media:1") is None
+
+
+async def test_redis_cache_roundtrip():
+    cache = RedisCache(FakeRedis(), ttl=60)
+    await cache.set("media:1", {"id": 1, "meme_description": "Котомем_1"})
+    assert await cache.get("media:1") == {"id": 1, "meme_description": "Котомем_1"}
+    await cache.delete("media:1")
+    assert await cache.get("media:1") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0}
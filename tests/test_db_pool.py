@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from ..database.db import PoolWaitMetrics
+
+
+class FakeConnection:
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class InstrumentedQueuePool(PoolWaitMetrics, QueuePool):
+    pass
+
+
+def test_pool_counts_checkouts_and_timeouts():
+    pool = InstrumentedQueuePool(
+        FakeConnection, pool_size=1, max_overflow=0, timeout=0.01
+    )
+    connection = pool.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    stats = pool.stats()
+    assert stats["checkouts"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["checked_out"] == 1
+    assert stats["max_wait_seconds"] >= 0.01
+    connection.close()
+    assert pool.stats()["checked_out"] == 0
+
+
+def test_pool_metrics_survive_recreate():
+    pool = InstrumentedQueuePool(FakeConnection, pool_size=1, max_overflow=0)
+    pool.connect().close()
+    assert pool.recreate().stats()["checkouts"] == 1
@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from ..schemas.job_schemas import JobRead
+from ..repositories.storage_repository import InMemoryStorageRepository
+from ..services.job_service import JobService, JobWorker
+from ..services.media_jobs import MediaJobs
+from ..utils.images import RenditionSpec
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeJobRepository:
+    def __init__(self):
+        self.jobs = {}
+        self.completed = []
+        self.failed = []
+
+    def __call__(self):
+        return self
+
+    async def enqueue(self, kind, payload, max_attempts, delay=0):
+        job = JobRead(
+            id=len(self.jobs) + 1,
+            kind=kind,
+            payload=payload,
+            attempts=0,
+            max_attempts=max_attempts,
+        )
+        self.jobs[job.id] = job
+        return job
+
+    async def claim(self, limit, lock_timeout):
+        claimed = list(self.jobs.values())[:limit]
+        for job in claimed:
+            del self.jobs[job.id]
+            job.attempts += 1
+        return claimed
+
+    async def complete(self, id):
+        self.completed.append(id)
+
+    async def fail(self, job, error, retry_in):
+        self.failed.append((job.id, job.attempts, retry_in))
+        if job.attempts < job.max_attempts:
+            self.jobs[job.id] = job
+
+
+async def run_until(condition, timeout=1):
+    async def wait():
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(wait(), timeout)
+
+
+async def test_worker_runs_enqueued_job():
+    repo = FakeJobRepository()
+    jobs = JobService(repo, max_attempts=3)
+    handled = []
+
+    async def handler(payload):
+        handled.append(payload)
+
+    worker = JobWorker(jobs, {"echo": handler}, poll_interval=5)
+    await worker.start()
+    await jobs.enqueue("echo", {"id": 1})
+    await run_until(lambda: repo.completed)
+    await worker.stop()
+    assert handled == [{"id": 1}]
+    assert repo.completed == [1]
+
+
+async def test_worker_retries_with_backoff_until_attempts_run_out():
+    repo = FakeJobRepository()
+    jobs = JobService(repo, max_attempts=3)
+
+    async def handler(payload):
+        raise RuntimeError("boom")
+
+    worker = JobWorker(jobs, {"boom": handler}, poll_interval=0.01, retry_backoff=1)
+    await worker.start()
+    await jobs.enqueue("boom", {})
+    await run_until(lambda: len(repo.failed) == 3)
+    await worker.stop()
+    assert repo.failed == [(1, 1, 1), (1, 2, 2), (1, 3, 4)]
+    assert repo.completed == []
+    assert repo.jobs == {}
+
+
+async def test_worker_fails_unknown_job_kind():
+    repo = FakeJobRepository()
+    jobs = JobService(repo, max_attempts=1)
+    worker = JobWorker(jobs, {}, poll_interval=0.01)
+    await worker.start()
+    await jobs.enqueue("unknown", {})
+    await run_until(lambda: repo.failed)
+    await worker.stop()
+    assert repo.failed[0][:2] == (1, 1)
+
+
+class FakeObjectStore:
+    def __init__(self, objects):
+        self.objects = objects
+
+    async def object_sha256(self, key):
+        return hashlib.sha256(self.objects[key]).hexdigest()
+
+    async def delete_object(self, key):
+        self.objects.pop(key, None)
+
+    @staticmethod
+    def media_url(key):
+        return key
+
+
+@pytest.mark.parametrize("content, kept", [(b"meme", True), (b"other", False)])
+async def test_verify_upload_removes_media_with_wrong_hash(content, kept):
+    repo = InMemoryStorageRepository()
+    sha256 = hashlib.sha256(b"meme").hexdigest()
+    media = await repo.add_one(
+        {"meme_url": "big.jpg", "meme_description": "big", "content_hash": sha256}
+    )
+    store = FakeObjectStore({"big.jpg": content})
+    jobs = MediaJobs(repo, store, renditions=[])
+    await jobs.verify_upload({"id": media.id, "key": "big.jpg", "sha256": sha256})
+    assert (await repo.get_one_by_id(media.id) is not None) is kept
+    assert ("big.jpg" in store.objects) is kept
+
+
+async def test_delete_object_keeps_objects_referenced_by_media():
+    repo = InMemoryStorageRepository()
+    await repo.add_one({"meme_url": "shared.jpg", "meme_description": "winner"})
+    store = FakeObjectStore({"shared.jpg": b"meme", "orphan.jpg": b"meme"})
+    jobs = MediaJobs(repo, store, renditions=[])
+    await jobs.delete_object({"key": "shared.jpg"})
+    await jobs.delete_object({"key": "orphan.jpg"})
+    assert list(store.objects) == ["shared.jpg"]
+
+
+class HeadOnlyStore:
+    def __init__(self, heads):
+        self.heads = heads
+        self.reads = []
+
+    async def head_object(self, key):
+        return self.heads.get(key)
+
+    async def read_object(self, key, length=None):
+        self.reads.append(key)
+        return b""
+
+
+async def test_renditions_skip_large_and_non_image_sources():
+    store = HeadOnlyStore(
+        {
+            "video.mp4": {"ContentType": "video/mp4", "ContentLength": 10},
+            "huge.jpg": {"ContentType": "image/jpeg", "ContentLength": 2**40},
+        }
+    )
+    jobs = MediaJobs(
+        InMemoryStorageRepository(), store, renditions=[RenditionSpec("t", 320, "webp")]
+    )
+    for key in ("video.mp4", "huge.jpg", "missing.jpg"):
+        await jobs.generate_renditions({"id": 1, "key": key})
+    assert store.reads == []
@@ -0,0 +1,38 @@
+import json
+import logging
+
+from ..utils.log_config import (
+    JsonFormatter,
+    SamplingFilter,
+    parse_levels,
+    parse_sampling,
+)
+
+
+def make_record(name: str, level: int, msg: str, *args) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_parse_levels():
+    assert parse_levels("sqlalchemy.engine:warning, services:DEBUG,") == {
+        "sqlalchemy.engine": "WARNING",
+        "services": "DEBUG",
+    }
+    assert parse_sampling("uvicorn.access:0.25") == {"uvicorn.access": 0.25}
+
+
+def test_sampling_keeps_warnings():
+    sampling = SamplingFilter({"uvicorn.access": 0.0})
+    assert not sampling.filter(make_record("uvicorn.access", logging.INFO, "GET /"))
+    assert sampling.filter(make_record("uvicorn.access", logging.WARNING, "GET /"))
+    assert sampling.filter(make_record("services", logging.INFO, "ok"))
+
+
+def test_json_formatter_formats_lazily():
+    record = make_record("services", logging.ERROR, "Job %s failed: %s", 7, "boom")
+    record.service = "storage_api"
+    record.trace_id = "abc"
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Job 7 failed: boom"
+    assert entry["level"] == "ERROR"
+    assert (entry["service"], entry["trace_id"]) == ("storage_api", "abc")
@@ -1,16 +1,28 @@
+import hashlib
 import io
+from contextlib import AsyncExitStack
 
 import pytest
+import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.exc import OperationalError
 
 from ..config import configs
 from ..database.db import Database
 from ..storage_api.storage_app import storage_app as app
+from ..storage.minio_client import open_minio_clients
 
 pytestmark = pytest.mark.asyncio
 
 
+@pytest_asyncio.fixture(scope="module", autouse=True)
+async def minio_clients():
+    # ASGITransport не запускает lifespan; воркер очереди тестам не нужен
+    async with AsyncExitStack() as stack:
+        await open_minio_clients(app.state, stack)
+        yield
+
+
 async def test_database_connection():
     database = Database(configs.DATABASE_URI)
 
@@ -36,16 +48,25 @@ async def test_get_all():
             "id": 1,
             "meme_url": "http://minio:9000/media-storage/images.jpg",
             "meme_description": "Котомем_1",
+            "width": None,
+            "height": None,
+            "renditions": {},
         },
         {
             "id": 2,
             "meme_url": "http://minio:9000/media-storage/images2.jpg",
             "meme_description": "Котомем_2",
+            "width": None,
+            "height": None,
+            "renditions": {},
         },
         {
             "id": 3,
             "meme_url": "http://minio:9000/media-storage/cat-guys-have-bad-news-theronswag-woke-up-again.png",
             "meme_description": "Котомем_3",
+            "width": None,
+            "height": None,
+            "renditions": {},
         },
     ]
     async with AsyncClient(
@@ -53,10 +74,49 @@ async def test_get_all():
     ) as ac:
         response = await ac.get("/media")
     json_response = response.json()
-    len_response = len(json_response)
     assert response.status_code == 200
-    assert len_response == 3
-    assert response.json() == expected_response
+    assert json_response["count"] == 3
+    assert json_response["items"] == expected_response
+    assert json_response["next_cursor"] is None
+
+
+async def test_get_all_cursor_pagination():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        first_page = await ac.get("/media", params={"limit": 2})
+        next_cursor = first_page.json()["next_cursor"]
+        second_page = await ac.get("/media", params={"limit": 2, "cursor": next_cursor})
+    assert [item["id"] for item in first_page.json()["items"]] == [1, 2]
+    assert [item["id"] for item in second_page.json()["items"]] == [3]
+    assert second_page.json()["next_cursor"] is None
+
+
+async def test_get_all_limit_above_max_page_size():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/media", params={"limit": configs.MAX_PAGE_SIZE + 1})
+    assert response.status_code == 422
+
+
+async def test_search():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/media/search", params={"q": "Котомем"})
+    assert response.status_code == 200
+    assert response.json()["count"] > 0
+    for item in response.json()["items"]:
+        assert "Котомем" in item["meme_description"]
+
+
+async def test_search_empty_query():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/media/search", params={"q": ""})
+    assert response.status_code == 422
 
 
 async def test_get_single_media_standard():
@@ -64,6 +124,9 @@ async def test_get_single_media_standard():
         "id": 1,
         "meme_url": "http://minio:9000/media-storage/images.jpg",
         "meme_description": "Котомем_1",
+        "width": None,
+        "height": None,
+        "renditions": {},
     }
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test"
@@ -82,12 +145,23 @@ async def test_get_single_media_non_existing_id():
     assert response.json() == {"detail": "Object not found."}
 
 
+async def test_get_content_non_existing_id():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/media/999/content", headers={"Range": "bytes=0-9"})
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Object not found."}
+
+
 async def test_add_single_media_standard():
     media_data = b"test file content"
     media_description = "Test Media Description"
     file_name = "testfile.txt"
     expected_response = {
-        "meme_url": f"http://minio:9000/media-storage/{file_name}",
+        # Файл хранится под ключом по SHA-256 содержимого
+        "meme_url": f"http://minio:9000/media-storage/"
+        f"{hashlib.sha256(media_data).hexdigest()}.txt",
         "meme_description": f"{media_description}",
     }
 
@@ -121,6 +195,23 @@ async def test_add_single_media_duplicate_file():
     }
 
 
+async def test_add_single_media_duplicate_content_renamed():
+    media_data = b"test file content"
+    media_description = "Test Media Description 3"
+    file_name = "another_name.txt"
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post(
+            "/media",
+            files={"media_data": (file_name, io.BytesIO(media_data), "images/jpeg")},
+            data={"media_description": media_description},
+        )
+    assert response.status_code == 409
+    assert response.json() == {
+        "detail": "Unique constraint violated: data already exists."
+    }
+
+
 async def test_add_single_media_duplicate_description():
     media_data = b"test file content"
     media_description = "Test Media Description"
@@ -143,6 +234,9 @@ async def test_update_single_media_standard():
         "id": 1,
         "meme_url": "http://minio:9000/media-storage/images.jpg",
         "meme_description": "Котомем_01",
+        "width": None,
+        "height": None,
+        "renditions": {},
     }
     description = {"meme_description": "Котомем_01"}
     async with AsyncClient(app=app, base_url="http://test") as ac:
@@ -1,6 +1,9 @@
+import hashlib
 import io
 
+import httpx
 import pytest
+import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.exc import OperationalError
 
@@ -11,6 +14,13 @@ from ..memes_api.memes_app import memes_app as app
 pytestmark = pytest.mark.asyncio
 
 
+@pytest_asyncio.fixture(scope="module", autouse=True)
+async def storage_client():
+    # ASGITransport не запускает lifespan, клиент storage_api открываем сами
+    async with app.router.lifespan_context(app):
+        yield
+
+
 async def test_database_connection():
     database = Database(configs.DATABASE_URI)
 
@@ -36,16 +46,25 @@ async def test_get_all():
             "id": 1,
             "meme_url": "http://127.0.0.1:9000/media-storage/images.jpg",
             "meme_description": "Котомем_1",
+            "width": None,
+            "height": None,
+            "renditions": {},
         },
         {
             "id": 2,
             "meme_url": "http://127.0.0.1:9000/media-storage/images2.jpg",
             "meme_description": "Котомем_2",
+            "width": None,
+            "height": None,
+            "renditions": {},
         },
         {
             "id": 3,
             "meme_url": "http://127.0.0.1:9000/media-storage/cat-guys-have-bad-news-theronswag-woke-up-again.png",
             "meme_description": "Котомем_3",
+            "width": None,
+            "height": None,
+            "renditions": {},
         },
     ]
     async with AsyncClient(
@@ -53,10 +72,49 @@ async def test_get_all():
     ) as ac:
         response = await ac.get("/memes")
     json_response = response.json()
-    len_response = len(json_response)
     assert response.status_code == 200
-    assert len_response == 3
-    assert response.json() == expected_response
+    assert json_response["count"] == 3
+    assert json_response["items"] == expected_response
+    assert json_response["next_cursor"] is None
+
+
+async def test_get_all_cursor_pagination():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        first_page = await ac.get("/memes", params={"limit": 2})
+        next_cursor = first_page.json()["next_cursor"]
+        second_page = await ac.get("/memes", params={"limit": 2, "cursor": next_cursor})
+    assert [item["id"] for item in first_page.json()["items"]] == [1, 2]
+    assert [item["id"] for item in second_page.json()["items"]] == [3]
+    assert second_page.json()["next_cursor"] is None
+
+
+async def test_get_all_limit_above_max_page_size():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/memes", params={"limit": configs.MAX_PAGE_SIZE + 1})
+    assert response.status_code == 422
+
+
+async def test_search():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/memes/search", params={"q": "Котомем"})
+    assert response.status_code == 200
+    assert response.json()["count"] > 0
+    for item in response.json()["items"]:
+        assert "Котомем" in item["meme_description"]
+
+
+async def test_search_empty_query():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/memes/search", params={"q": ""})
+    assert response.status_code == 422
 
 
 async def test_get_single_memes_standard():
@@ -64,6 +122,9 @@ async def test_get_single_memes_standard():
         "id": 1,
         "meme_url": "http://127.0.0.1:9000/media-storage/images.jpg",
         "meme_description": "Котомем_1",
+        "width": None,
+        "height": None,
+        "renditions": {},
     }
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test"
@@ -82,12 +143,51 @@ async def test_get_single_memes_non_existing_id():
     assert response.json() == {"detail": "Object not found."}
 
 
+async def test_get_content_non_existing_id():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/memes/999/content", headers={"Range": "bytes=0-9"})
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Object not found."}
+
+
+@pytest.mark.parametrize(
+    "status, body, headers",
+    [
+        (502, b"<html>Bad gateway</html>", {"Content-Type": "text/html"}),
+        (416, b"", {"Content-Range": "bytes */100"}),
+    ],
+)
+async def test_get_content_non_json_error(monkeypatch, status, body, headers):
+    storage = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(status, content=body, headers=headers)
+        ),
+        base_url="http://storage",
+    )
+    monkeypatch.setattr(app.state, "storage_client", storage)
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/memes/1/content")
+    assert response.status_code == status
+    assert response.json() == {"detail": "Failed to get content"}
+    # Заголовки описывают JSON-тело ошибки, а не тело storage_api
+    assert response.headers["content-type"] == "application/json"
+    assert int(response.headers["content-length"]) == len(response.content)
+    if "Content-Range" in headers:
+        assert response.headers["content-range"] == headers["Content-Range"]
+
+
 async def test_add_single_memes_standard():
     memes_data = b"test file content"
     memes_description = "Test Media Description"
     file_name = "testfile.txt"
     expected_response = {
-        "meme_url": f"http://127.0.0.1:9000/media-storage/{file_name}",
+        # Файл хранится под ключом по SHA-256 содержимого
+        "meme_url": f"http://127.0.0.1:9000/media-storage/"
+        f"{hashlib.sha256(memes_data).hexdigest()}.txt",
         "meme_description": f"{memes_description}",
     }
 
@@ -121,6 +221,23 @@ async def test_add_single_memes_duplicate_file():
     }
 
 
+async def test_add_single_memes_duplicate_content_renamed():
+    memes_data = b"test file content"
+    memes_description = "Test Media Description 3"
+    file_name = "another_name.txt"
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post(
+            "/memes",
+            files={"meme_data": (file_name, io.BytesIO(memes_data), "images/jpeg")},
+            data={"meme_description": memes_description},
+        )
+    assert response.status_code == 409
+    assert response.json() == {
+        "detail": "Unique constraint violated: data already exists."
+    }
+
+
 async def test_add_single_memes_duplicate_description():
     memes_data = b"test file content"
     memes_description = "Test Media Description"
@@ -143,6 +260,9 @@ async def test_update_single_memes_standard():
         "id": 1,
         "meme_url": "http://127.0.0.1:9000/media-storage/images.jpg",
         "meme_description": "Котомем_01",
+        "width": None,
+        "height": None,
+        "renditions": {},
     }
     description = {"meme_description": "Котомем_01"}
     async with AsyncClient(app=app, base_url="http://test") as ac:
@@ -156,7 +276,7 @@ async def test_update_single_memes_non_existing_id():
     async with AsyncClient(app=app, base_url="http://test") as ac:
         response = await ac.put(f"/memes/999", json=description)
     assert response.status_code == 404
-    assert response.json() == {'detail': 'This entry does not exist'}
+    assert response.json() == {"detail": "This entry does not exist"}
 
 
 async def test_delete_single_memes_standard():
@@ -0,0 +1,50 @@
+import httpx
+import pytest
+from httpx import ASGITransport, AsyncClient
+from prometheus_client import REGISTRY
+
+from ..memes_api import storage_client
+from ..memes_api.memes_app import memes_app
+
+# Второй импорт utils.metrics зарегистрировал бы метрики повторно
+path_template = storage_client.path_template
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    async with AsyncClient(
+        transport=ASGITransport(app=memes_app), base_url="http://test"
+    ) as ac:
+        await ac.get("/")
+        response = await ac.get("/metrics")
+    assert response.status_code == 200
+    assert (
+        'http_request_duration_seconds_count{app="memes_api",method="GET",route="/"'
+        in response.text
+    )
+
+
+def test_path_template():
+    assert path_template("/media/42/content") == "/media/{id}/content"
+    assert (
+        path_template("/media/uploads/abc.DEF-1_2/complete")
+        == "/media/uploads/{token}/complete"
+    )
+
+
+@pytest.mark.asyncio
+async def test_upload_completion_stage_label_is_bounded():
+    client = storage_client.create_storage_client()
+    client._transport = httpx.MockTransport(lambda request: httpx.Response(200))
+    async with client:
+        for token in ("first.token", "second.token"):
+            await client.post(f"/media/uploads/{token}/complete", json={})
+
+    stages = {
+        sample.labels["stage"]
+        for metric in REGISTRY.collect()
+        if metric.name == "stage_duration_seconds"
+        for sample in metric.samples
+    }
+    assert "downstream POST /media/uploads/{token}/complete" in stages
+    assert not any(".token" in stage for stage in stages)
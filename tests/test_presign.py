@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from ..services.minio_service import MinioService
+from ..utils.cache import InMemoryCache
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakePresignClient:
+    def __init__(self):
+        self.signed = 0
+
+    async def generate_presigned_url(self, operation, Params, ExpiresIn):
+        self.signed += 1
+        return f"http://minio/{Params['Key']}?signature={self.signed}"
+
+
+async def test_presigned_urls_are_reused_from_cache():
+    client = FakePresignClient()
+    service = MinioService(client, url_cache=InMemoryCache(ttl=60, max_size=10))
+    first = await service.presign_get_urls(["a.png", "b.png", "a.png"])
+    second = await service.presign_get_urls(["b.png", "a.png"])
+    assert first == second
+    assert client.signed == 2
+
+
+async def test_presigned_urls_are_refreshed_after_ttl():
+    client = FakePresignClient()
+    service = MinioService(client, url_cache=InMemoryCache(ttl=0.01, max_size=10))
+    first = await service.presign_get_url("a.png")
+    await asyncio.sleep(0.02)
+    second = await service.presign_get_url("a.png")
+    assert first != second
+    assert client.signed == 2
+
+
+async def test_custom_expiry_bypasses_cache():
+    client = FakePresignClient()
+    service = MinioService(client, url_cache=InMemoryCache(ttl=60, max_size=10))
+    await service.presign_get_url("a.png", expires_in=5)
+    await service.presign_get_url("a.png", expires_in=5)
+    assert client.signed == 2
@@ -0,0 +1,62 @@
+import io
+
+import pytest
+
+from ..utils.images import (
+    RenditionSpec,
+    can_save,
+    parse_renditions,
+    render_renditions,
+)
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def make_image(width, height, mode="RGB", image_format="PNG"):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height)).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def test_parse_renditions():
+    assert parse_renditions("thumb:320:webp, medium:1080:WEBP,") == [
+        RenditionSpec("thumb", 320, "webp"),
+        RenditionSpec("medium", 1080, "webp"),
+    ]
+    assert parse_renditions("") == []
+    with pytest.raises(ValueError):
+        parse_renditions("thumb:320:bmp")
+
+
+def test_parse_renditions_rejects_formats_pillow_cannot_save(monkeypatch):
+    Image.init()
+    monkeypatch.delitem(Image.SAVE, "WEBP")
+    assert not can_save("webp")
+    with pytest.raises(ValueError):
+        parse_renditions("thumb:320:webp")
+
+
+def test_render_renditions_keeps_aspect_ratio_and_does_not_upscale():
+    specs = [RenditionSpec("thumb", 100, "webp"), RenditionSpec("big", 1000, "jpeg")]
+    size, renditions = render_renditions(make_image(400, 200, "RGBA"), specs, 80)
+    assert size == (400, 200)
+    thumb, big = renditions
+    assert (thumb.width, thumb.height) == (100, 50)
+    assert (big.width, big.height) == (400, 200)
+    assert Image.open(io.BytesIO(thumb.content)).format == "WEBP"
+    assert Image.open(io.BytesIO(big.content)).format == "JPEG"
+
+
+def test_render_renditions_applies_exif_rotation_to_size():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: повернуть на 90 градусов
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 200)).save(buffer, format="JPEG", exif=exif)
+    specs = [RenditionSpec("thumb", 100, "jpeg")]
+    size, (thumb,) = render_renditions(buffer.getvalue(), specs, 80)
+    assert size == (200, 400)
+    assert (thumb.width, thumb.height) == (50, 100)
+
+
+def test_render_renditions_ignores_non_images():
+    assert render_renditions(b"not an image", [], 80) == (None, [])
@@ -0,0 +1,116 @@
+import pytest
+from fastapi import HTTPException
+
+from ..database.db import SQLiteDatabase
+from ..repositories.storage_repository import (
+    InMemoryStorageRepository,
+    SQLiteStorageRepository,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repo(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryStorageRepository()
+    database = SQLiteDatabase(
+        f"sqlite+aiosqlite:///{tmp_path / 'memes.db'}",
+        [SQLiteStorageRepository.model.__table__],
+    )
+    return SQLiteStorageRepository(database)
+
+
+def meme(n: int, **values) -> dict:
+    return {
+        "meme_url": f"http://minio/memes/{n}.jpg",
+        "meme_description": f"meme number {n}",
+        **values,
+    }
+
+
+async def test_add_and_get(repo):
+    added = await repo.add_one(meme(1, content_hash="a" * 64))
+    media = await repo.get_one_by_id(added.id)
+    assert media.meme_description == "meme number 1"
+    assert media.renditions == {}
+    assert (await repo.get_one_by(content_hash="a" * 64)).id == added.id
+    assert await repo.get_one_by(meme_description="missing") is None
+    assert await repo.get_one_by_id(added.id + 1) is None
+
+
+async def test_unique_fields(repo):
+    await repo.add_one(meme(1))
+    with pytest.raises(HTTPException) as e:
+        await repo.add_one(meme(2, meme_description="meme number 1"))
+    assert e.value.status_code == 409
+
+    second = await repo.add_one(meme(2))
+    with pytest.raises(HTTPException) as e:
+        await repo.update_one(second.id, meme_description="meme number 1")
+    assert e.value.status_code == 409
+    # Описание освобождается после изменения записи
+    await repo.update_one(1, meme_description="renamed")
+    updated = await repo.update_one(second.id, meme_description="meme number 1")
+    assert updated.meme_description == "meme number 1"
+
+
+async def test_add_many_is_atomic(repo):
+    await repo.add_one(meme(1))
+    with pytest.raises(HTTPException):
+        await repo.add_many([meme(2), meme(1)])
+    with pytest.raises(HTTPException):
+        await repo.add_many([meme(3), meme(3)])
+    added = await repo.add_many([meme(2), meme(3)])
+    assert [row.meme_description for row in added] == [
+        "meme number 2",
+        "meme number 3",
+    ]
+    assert len(await repo.get_all(limit=10)) == 3
+
+
+async def test_get_many_by(repo):
+    await repo.add_many([meme(n) for n in range(1, 4)])
+    found = await repo.get_many_by(
+        "meme_description", ["meme number 3", "missing", "meme number 1"]
+    )
+    assert sorted(item.id for item in found) == [1, 3]
+    assert await repo.get_many_by("meme_description", ["missing"]) == []
+
+
+async def test_pagination(repo):
+    await repo.add_many([meme(n) for n in range(1, 6)])
+    assert [m.id for m in await repo.get_all(skip=1, limit=2)] == [2, 3]
+    assert [m.id for m in await repo.get_all(limit=10, after_id=3)] == [4, 5]
+    with pytest.raises(HTTPException) as e:
+        await repo.get_all(limit=10, after_id=5)
+    assert e.value.status_code == 404
+    await repo.delete_many([2, 3])
+    assert [m.id for m in await repo.get_all(limit=2, after_id=1)] == [4, 5]
+
+
+async def test_delete(repo):
+    await repo.add_many([meme(n) for n in range(1, 5)])
+    assert await repo.delete_one(1)
+    with pytest.raises(HTTPException) as e:
+        await repo.delete_one(1)
+    assert e.value.status_code == 404
+    assert sorted(await repo.delete_many([2, 3, 42])) == [2, 3]
+    assert [m.id for m in await repo.get_many_by_ids([1, 4, 4])] == [4]
+    # Удалённые значения снова свободны
+    await repo.add_one(meme(1))
+
+
+async def test_search(repo):
+    await repo.add_many(
+        [
+            meme(1, meme_description="Grumpy cat"),
+            meme(2, meme_description="dancing dog"),
+            meme(3, meme_description="cat and dog"),
+        ]
+    )
+    found = await repo.search("cat", limit=1)
+    assert [(media.id, rank) for media, rank in found] == [(3, 1.0)]
+    found = await repo.search("CAT", limit=10, after=(1.0, 3))
+    assert [media.id for media, _ in found] == [1]
+    assert [media.id for media, _ in await repo.search("dog cat")] == [3]
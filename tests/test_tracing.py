@@ -0,0 +1,105 @@
+import sys
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from ..memes_api import storage_client
+from ..utils import tracing
+from ..utils.tracing import TracingMiddleware, parse_traceparent, start_span
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span.to_dict())
+
+
+def test_parse_traceparent():
+    context = parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")
+    assert (context.trace_id, context.span_id, context.sampled) == (
+        TRACE_ID,
+        PARENT_ID,
+        True,
+    )
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00").sampled is False
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+
+
+@pytest.mark.asyncio
+async def test_middleware_continues_incoming_trace(monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracing, "exporter", exporter)
+
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, service="test")
+
+    @app.get("/items/{id}")
+    async def get_item(id: int):
+        with start_span("db.get_one_by_id"):
+            return id
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get(
+            "/items/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+        )
+    assert response.status_code == 200
+
+    child, root = exporter.spans
+    assert root["name"] == "GET /items/{id}"
+    assert root["trace_id"] == child["trace_id"] == TRACE_ID
+    assert root["parent_id"] == PARENT_ID
+    assert child["parent_id"] == root["span_id"]
+    assert root["attributes"]["http.status_code"] == 200
+
+
+@pytest.mark.asyncio
+async def test_unsampled_trace_is_not_exported(monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracing, "exporter", exporter)
+
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, service="test")
+
+    @app.get("/")
+    async def root():
+        return "ok"
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        await ac.get("/", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    assert exporter.spans == []
+
+
+@pytest.mark.asyncio
+async def test_downstream_span_ends_on_connection_error(monkeypatch):
+    # storage_client импортирует utils.tracing по абсолютному имени
+    traced = sys.modules[storage_client.child_span.__module__]
+    exporter = ListExporter()
+    monkeypatch.setattr(traced, "exporter", exporter)
+
+    client = storage_client.create_storage_client()
+    client.base_url = "http://127.0.0.1:1"
+    root = traced.Span("root", "test", traced.SpanContext(TRACE_ID, PARENT_ID, True))
+    token = traced._current_span.set(root)
+    try:
+        with pytest.raises(httpx.ConnectError):
+            await client.get("/media/1")
+    finally:
+        traced._current_span.reset(token)
+        await client.aclose()
+
+    (span,) = exporter.spans
+    assert span["name"] == "downstream GET /media/{id}"
+    assert span["status"] == "error"
+    assert span["parent_id"] == PARENT_ID
@@ -0,0 +1,127 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+
+from config import configs
+
+
+class AbstractCache(ABC):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class NullCache(AbstractCache):
+    async def get(self, key: str) -> Optional[Any]:
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        pass
+
+    async def delete(self, key: str) -> None:
+        pass
+
+
+class InMemoryCache(AbstractCache):
+    """TTL + LRU кэш в памяти процесса.
+
+    У каждого воркера свой кэш, поэтому после изменения записи в другом
+    воркере устаревшее значение живёт не дольше ttl.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        super().__init__()
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+
+class RedisCache(AbstractCache):
+    """Кэш поверх клиента с интерфейсом redis.asyncio (get / set(ex=) / delete).
+
+    Вытеснением занимается сам Redis, поэтому evictions здесь не считаются.
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = "memes:"):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, key: str, value: Any) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value), ex=int(self.ttl))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+
+def build_presigned_url_cache() -> InMemoryCache:
+    # Запись живёт долю срока ссылки: выданная ссылка всегда действует
+    # ещё не меньше (1 - PRESIGNED_URL_REFRESH_FRACTION) её срока
+    ttl = configs.PRESIGNED_GET_EXPIRES * configs.PRESIGNED_URL_REFRESH_FRACTION
+    return InMemoryCache(ttl, configs.PRESIGNED_URL_CACHE_SIZE)
+
+
+def build_cache() -> AbstractCache:
+    backend = configs.MEDIA_CACHE_BACKEND
+    if backend == "memory":
+        return InMemoryCache(configs.MEDIA_CACHE_TTL, configs.MEDIA_CACHE_MAX_SIZE)
+    if backend == "redis":
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("MEDIA_CACHE_BACKEND=redis requires the redis package")
+        return RedisCache(redis.from_url(configs.REDIS_URL), configs.MEDIA_CACHE_TTL)
+    return NullCache()
@@ -0,0 +1,90 @@
+import io
+from typing import List, NamedTuple, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+FORMAT_CONTENT_TYPES = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "avif": "image/avif",
+}
+
+
+class RenditionSpec(NamedTuple):
+    name: str
+    size: int
+    format: str
+
+
+class Rendition(NamedTuple):
+    name: str
+    format: str
+    content: bytes
+    width: int
+    height: int
+
+
+def parse_renditions(spec: str) -> List[RenditionSpec]:
+    """Разбирает строку вида "thumb:320:webp,medium:1080:webp"."""
+    renditions = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, size, file_format = item.split(":")
+        if file_format.lower() not in FORMAT_CONTENT_TYPES or not can_save(file_format):
+            raise ValueError(f"Unsupported rendition format: {file_format}")
+        renditions.append(RenditionSpec(name, int(size), file_format.lower()))
+    return renditions
+
+
+def can_save(file_format: str) -> bool:
+    # Кодек avif есть не в каждой сборке Pillow: проверяем реестр плагинов записи
+    if Image is None:
+        return True
+    Image.init()
+    return file_format.upper() in Image.SAVE
+
+
+def read_image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def render_renditions(
+    data: bytes, specs: List[RenditionSpec], quality: int
+) -> Tuple[Optional[Tuple[int, int]], List[Rendition]]:
+    """Уменьшает изображение до каждого из размеров specs.
+
+    Выполняется в пуле процессов: декодирование и сжатие держат GIL,
+    поэтому в потоке они тормозили бы цикл событий.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception:
+        return None, []
+
+    # Учитываем поворот из EXIF, у анимаций берётся первый кадр
+    image = ImageOps.exif_transpose(image)
+    size = image.size
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    renditions = []
+    for spec in specs:
+        resized = image.copy()
+        # thumbnail сохраняет пропорции и не увеличивает маленькие картинки
+        resized.thumbnail((spec.size, spec.size), Image.LANCZOS)
+        if spec.format == "jpeg" and resized.mode == "RGBA":
+            resized = resized.convert("RGB")
+        buffer = io.BytesIO()
+        resized.save(buffer, format=spec.format.upper(), quality=quality)
+        renditions.append(
+            Rendition(spec.name, spec.format, buffer.getvalue(), *resized.size)
+        )
+    return size, renditions
@@ -0,0 +1,133 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from config import configs
+from utils.tracing import current_span
+
+# Логгеры uvicorn по умолчанию пишут в stdout сами, мимо очереди
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_listener: Optional[QueueListener] = None
+
+
+def parse_levels(value: str) -> Dict[str, str]:
+    """'sqlalchemy.engine:WARNING,services:DEBUG' -> {имя логгера: уровень}"""
+    levels = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, level = item.strip().rpartition(":")
+        levels[name] = level.upper()
+    return levels
+
+
+def parse_sampling(value: str) -> Dict[str, float]:
+    """'uvicorn.access:0.1' -> {имя логгера: доля сохраняемых записей}"""
+    return {name: float(rate) for name, rate in parse_levels(value).items()}
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет к записи сервис и trace_id текущего запроса.
+
+    Выполняется в потоке, который пишет лог, поэтому видит contextvars запроса.
+    """
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = current_span()
+        # В одном процессе могут работать оба приложения, сервис берётся из span
+        record.service = span.service if span is not None else self.service
+        record.trace_id = span.context.trace_id if span is not None else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю записей ниже WARNING от шумных логгеров."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name)
+        return rate is None or random.random() < rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """При переполнении очереди запись отбрасывается, а не блокирует запрос."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "service": getattr(record, "service", None),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(service: str) -> None:
+    """Логи пишутся в очередь, а в stdout их выводит фоновый поток.
+
+    Цикл событий не ждёт stdout, форматирование сообщения выполняется
+    только для записей, прошедших уровень и сэмплирование.
+    """
+    global _listener
+    if _listener is not None:
+        # Оба приложения могут быть импортированы в одном процессе (тесты)
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if configs.LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+
+    log_queue = queue.Queue(maxsize=configs.LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(parse_sampling(configs.LOG_SAMPLING)))
+    handler.addFilter(ContextFilter(service))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(configs.LOG_LEVEL.upper())
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+    for name, level in parse_levels(configs.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
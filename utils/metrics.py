@@ -0,0 +1,140 @@
+import functools
+import re
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from utils.tracing import start_span
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["app", "method", "route", "status"],
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Latency of internal stages: database, object storage, downstream calls",
+    ["stage"],
+)
+UPLOAD_BYTES = Counter(
+    "media_upload_bytes", "Bytes written to object storage", ["source"]
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Контекстный менеджер: with observe_stage("s3.put_object"): ...
+
+    Кроме гистограммы этап записывается span'ом в трассу текущего запроса.
+    """
+    with STAGE_LATENCY.labels(stage).time(), start_span(stage):
+        yield
+
+
+def timed(stage: str):
+    """Декоратор для async-методов, измеряющий их длительность как этап."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with observe_stage(stage):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class StatsCollector(Collector):
+    """Отдаёт словарь stats() как метрики в момент опроса /metrics."""
+
+    def __init__(
+        self, prefix: str, stats: Callable[[], dict], counters: Iterable[str] = ()
+    ):
+        self.prefix = prefix
+        self.stats = stats
+        self.counters = set(counters)
+
+    def collect(self):
+        try:
+            values = self.stats()
+        except Exception:
+            return
+        for key, value in values.items():
+            name = f"{self.prefix}_{key}"
+            if key in self.counters:
+                yield CounterMetricFamily(name, name, value=value)
+            else:
+                yield GaugeMetricFamily(name, name, value=value)
+
+
+def register_stats(
+    prefix: str, stats: Callable[[], dict], counters: Iterable[str] = ()
+) -> None:
+    REGISTRY.register(StatsCollector(prefix, stats, counters))
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: латентность запросов по шаблону маршрута.
+
+    Время считается до отправки последнего байта ответа, поэтому
+    потоковые ответы учитываются целиком.
+    """
+
+    def __init__(self, app, app_name: str):
+        self.app = app
+        self.app_name = app_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Шаблон пути вместо самого пути, чтобы id не раздували число серий
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                self.app_name,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            ).observe(time.perf_counter() - started)
+
+
+# Переменные сегменты путей storage_api: id записи и подписанный токен загрузки.
+# Токен в метку не попадает: серий было бы по одной на загрузку, а /metrics публичный
+_PATH_SEGMENTS = (
+    (re.compile(r"(?<=/uploads/)[^/]+"), "{token}"),
+    (re.compile(r"/\d+(?=/|$)"), "/{id}"),
+)
+
+
+def path_template(path: str) -> str:
+    for pattern, replacement in _PATH_SEGMENTS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
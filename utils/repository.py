@@ -1,11 +1,15 @@
+import itertools
 from abc import ABC, abstractmethod
-from typing import Any, List
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
-from sqlalchemy import select, insert, exists, update, delete
+from sqlalchemy import Integer, any_, bindparam, select, insert, update, delete
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError
 
-from database.db import async_session_maker
+from database.db import SQLiteDatabase, async_session_maker
+from utils.metrics import timed
 
 
 class AbstractRepository(ABC):
@@ -13,12 +17,18 @@ class AbstractRepository(ABC):
     async def get_one_by_id(self, item: Any) -> Any:
         raise NotImplementedError
 
+    @abstractmethod
+    async def get_one_by(self, **filters) -> Any:
+        raise NotImplementedError
+
     @abstractmethod
     async def add_one(self, item: Any) -> Any:
         raise NotImplementedError
 
     @abstractmethod
-    async def get_all(self, skip: int = 0, limit: int = 10) -> Any:
+    async def get_all(
+        self, skip: int = 0, limit: int = 10, after_id: Optional[int] = None
+    ) -> Any:
         raise NotImplementedError
 
     @abstractmethod
@@ -29,38 +39,85 @@ class AbstractRepository(ABC):
     async def delete_one(self, id: Any) -> Any:
         raise NotImplementedError
 
+    @abstractmethod
+    async def get_many_by_ids(self, ids: List[Any]) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_many_by(self, field: str, values: List[Any]) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add_many(self, items: List[Any]) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_many(self, ids: List[Any]) -> Any:
+        raise NotImplementedError
+
     def __call__(self):
         return self
 
 
+def is_unique_violation(error: IntegrityError) -> bool:
+    # Postgres: "unique constraint", SQLite: "UNIQUE constraint failed"
+    return "unique constraint" in str(error.orig).lower()
+
+
 class SQLAlchemyRepository(AbstractRepository):
     model = None
+    # Фабрика сессий; репозиторий другой базы подменяет её в экземпляре
+    session_maker = async_session_maker
 
-    async def get_all(self, skip: int = 0, limit: int = 10) -> List[model]:
-        async with async_session_maker() as session:
-            stmt = select(self.model).offset(skip).limit(limit)
-            res = await session.execute(stmt)
-            res = [row[0].to_read_model() for row in res.all()]
-            if len(res) == 0:
-                raise HTTPException(status_code=404, detail="Object not found.")
-            return res
+    def _page_query(
+        self, skip: int = 0, limit: int = 10, after_id: Optional[int] = None
+    ):
+        stmt = select(self.model).order_by(self.model.id).limit(limit)
+        if after_id is not None:
+            # Keyset-пагинация: поиск по индексу первичного ключа вместо OFFSET
+            stmt = stmt.where(self.model.id > after_id)
+        elif skip:
+            stmt = stmt.offset(skip)
+        return stmt
+
+    @timed("db.get_all")
+    async def get_all(
+        self, skip: int = 0, limit: int = 10, after_id: Optional[int] = None
+    ) -> List[model]:
+        # Страница ограничена MAX_PAGE_SIZE: один запрос без серверного курсора
+        async with self.session_maker() as session:
+            res = await session.execute(self._page_query(skip, limit, after_id))
+            res = [obj.to_read_model() for obj in res.scalars()]
+        if len(res) == 0:
+            raise HTTPException(status_code=404, detail="Object not found.")
+        return res
 
+    @timed("db.get_one_by_id")
     async def get_one_by_id(self, id: int) -> model:
-        async with async_session_maker() as session:
+        async with self.session_maker() as session:
             stmt = select(self.model).where(self.model.id == id)
             res = await session.execute(stmt)
             obj = res.scalar()
             return obj.to_read_model() if obj else None
 
+    @timed("db.get_one_by")
+    async def get_one_by(self, **filters) -> model:
+        async with self.session_maker() as session:
+            stmt = select(self.model).filter_by(**filters).limit(1)
+            res = await session.execute(stmt)
+            obj = res.scalar()
+            return obj.to_read_model() if obj else None
+
+    @timed("db.add_one")
     async def add_one(self, data: dict) -> model:
-        async with async_session_maker() as session:
+        async with self.session_maker() as session:
             stmt = insert(self.model).values(**data).returning(self.model)
             try:
                 res = await session.execute(stmt)
                 await session.commit()
                 return res.scalar()
             except IntegrityError as e:
-                if "unique constraint" in str(e.orig):
+                if is_unique_violation(e):
                     raise HTTPException(
                         status_code=409,
                         detail="Unique constraint violated: data already exists.",
@@ -74,13 +131,10 @@ class SQLAlchemyRepository(AbstractRepository):
                 print("Error occurred while executing query:", str(e))
                 raise
 
+    @timed("db.update_one")
     async def update_one(self, id: int, **kwargs):
-        async with async_session_maker() as session:
-            stmt_exist = select(exists().where(getattr(self.model, "id") == id))
-            res_exist = await session.execute(stmt_exist)
-            if not res_exist.scalar():
-                raise HTTPException(status_code=404, detail="This entry does not exist")
-
+        async with self.session_maker() as session:
+            # UPDATE ... RETURNING: отсутствие строки видно по пустому результату
             stmt = (
                 update(self.model)
                 .where(getattr(self.model, "id") == id)
@@ -89,10 +143,15 @@ class SQLAlchemyRepository(AbstractRepository):
             )
             try:
                 res = await session.execute(stmt)
+                obj = res.scalar()
+                if obj is None:
+                    raise HTTPException(
+                        status_code=404, detail="This entry does not exist"
+                    )
                 await session.commit()
-                return res.scalar()
+                return obj.to_read_model()
             except IntegrityError as e:
-                if "unique constraint" in str(e.orig):
+                if is_unique_violation(e):
                     raise HTTPException(
                         status_code=409,
                         detail="Unique constraint violated: data already exists.",
@@ -102,20 +161,229 @@ class SQLAlchemyRepository(AbstractRepository):
                         status_code=500, detail="Database error occurred."
                     )
 
+            except HTTPException:
+                raise
             except Exception as e:
                 print("Error occurred while executing query:", e)
                 raise
 
+    @timed("db.delete_one")
     async def delete_one(self, id: int) -> bool:
-        async with async_session_maker() as session:
-            # Проверяем, существует ли запись с переданным идентификатором
-            stmt_exist = select(exists().where(getattr(self.model, "id") == id))
-            res_exist = await session.execute(stmt_exist)
-            if not res_exist.scalar():
-                raise HTTPException(status_code=404, detail=f"Entry not found.")
-
-            # Удаляем запись из базы данных
-            stmt = delete(self.model).where(getattr(self.model, "id") == id)
-            await session.execute(stmt)
+        async with self.session_maker() as session:
+            # DELETE ... RETURNING id: один запрос вместо проверки и удаления
+            stmt = (
+                delete(self.model)
+                .where(getattr(self.model, "id") == id)
+                .returning(getattr(self.model, "id"))
+            )
+            res = await session.execute(stmt)
+            if res.scalar() is None:
+                raise HTTPException(status_code=404, detail="Entry not found.")
+            await session.commit()
+        return True
+
+    def _any_filter(self, column, values: List[Any]):
+        # Один параметр-массив: WHERE column = ANY($1) вместо списка IN
+        param = bindparam(
+            f"{column.key}_values", list(values), type_=ARRAY(column.type)
+        )
+        return column == any_(param)
+
+    def _ids_filter(self, ids: List[int]):
+        return self._any_filter(self.model.id, ids)
+
+    @timed("db.get_many_by_ids")
+    async def get_many_by_ids(self, ids: List[int]) -> List[model]:
+        async with self.session_maker() as session:
+            stmt = (
+                select(self.model).where(self._ids_filter(ids)).order_by(self.model.id)
+            )
+            res = await session.execute(stmt)
+            return [obj.to_read_model() for obj in res.scalars()]
+
+    @timed("db.get_many_by")
+    async def get_many_by(self, field: str, values: List[Any]) -> List[model]:
+        async with self.session_maker() as session:
+            column = getattr(self.model, field)
+            stmt = select(self.model).where(self._any_filter(column, values))
+            res = await session.execute(stmt)
+            return [obj.to_read_model() for obj in res.scalars()]
+
+    @timed("db.add_many")
+    async def add_many(self, data: List[dict]) -> List[model]:
+        async with self.session_maker() as session:
+            # Один многострочный INSERT ... RETURNING в одной транзакции
+            stmt = insert(self.model).values(data).returning(self.model)
+            try:
+                res = await session.execute(stmt)
+                objs = res.scalars().all()
+                await session.commit()
+                return objs
+            except IntegrityError as e:
+                if is_unique_violation(e):
+                    raise HTTPException(
+                        status_code=409,
+                        detail="Unique constraint violated: data already exists.",
+                    )
+                else:
+                    raise HTTPException(
+                        status_code=500, detail="Database error occurred."
+                    )
+
+    @timed("db.delete_many")
+    async def delete_many(self, ids: List[int]) -> List[int]:
+        async with self.session_maker() as session:
+            stmt = (
+                delete(self.model).where(self._ids_filter(ids)).returning(self.model.id)
+            )
+            res = await session.execute(stmt)
+            deleted = list(res.scalars())
             await session.commit()
+        return deleted
+
+
+class SQLiteRepository(SQLAlchemyRepository):
+    """Те же запросы поверх aiosqlite: прогоны без Postgres."""
+
+    def __init__(self, database: SQLiteDatabase):
+        self.session_maker = database.session
+
+    def _any_filter(self, column, values: List[Any]):
+        # В SQLite нет массивов, список значений передаётся через IN
+        return column.in_(list(values))
+
+
+class InMemoryRepository(AbstractRepository):
+    """Записи в словаре процесса.
+
+    Уникальные поля проверяются по вторичным индексам значение -> id за O(1).
+    Данные не переживают перезапуск и не общие для воркеров uvicorn.
+    """
+
+    model = None
+    unique_fields: Tuple[str, ...] = ()
+
+    def __init__(self):
+        self.rows: Dict[int, Any] = {}
+        # Отсортированные id для keyset-пагинации; id растут монотонно,
+        # поэтому вставка - это append
+        self.ids: List[int] = []
+        self.indexes: Dict[str, Dict[Any, int]] = {
+            field: {} for field in self.unique_fields
+        }
+        self._ids = itertools.count(1)
+
+    def _check_unique(self, data: dict, exclude: Optional[int] = None):
+        for field, index in self.indexes.items():
+            value = data.get(field)
+            if value is not None and index.get(value, exclude) != exclude:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Unique constraint violated: data already exists.",
+                )
+
+    def _index(self, row):
+        for field, index in self.indexes.items():
+            value = getattr(row, field)
+            if value is not None:
+                index[value] = row.id
+
+    def _unindex(self, row):
+        for field, index in self.indexes.items():
+            index.pop(getattr(row, field), None)
+
+    def _insert(self, data: dict):
+        row = self.model(id=next(self._ids), **data)
+        self.rows[row.id] = row
+        self.ids.append(row.id)
+        self._index(row)
+        return row
+
+    def _remove(self, id: int):
+        row = self.rows.pop(id, None)
+        if row is not None:
+            del self.ids[bisect_left(self.ids, id)]
+            self._unindex(row)
+        return row
+
+    async def get_one_by_id(self, id: int) -> model:
+        row = self.rows.get(id)
+        return row.to_read_model() if row else None
+
+    async def get_one_by(self, **filters) -> model:
+        indexed = [field for field in filters if field in self.indexes]
+        if indexed:
+            id = self.indexes[indexed[0]].get(filters[indexed[0]])
+            candidates = [self.rows[id]] if id is not None else []
+        else:
+            candidates = self.rows.values()
+        for row in candidates:
+            if all(getattr(row, k) == v for k, v in filters.items()):
+                return row.to_read_model()
+        return None
+
+    async def add_one(self, data: dict) -> model:
+        self._check_unique(data)
+        return self._insert(data)
+
+    async def get_all(
+        self, skip: int = 0, limit: int = 10, after_id: Optional[int] = None
+    ) -> List[model]:
+        start = bisect_right(self.ids, after_id) if after_id is not None else skip
+        res = [self.rows[id].to_read_model() for id in self.ids[start : start + limit]]
+        if len(res) == 0:
+            raise HTTPException(status_code=404, detail="Object not found.")
+        return res
+
+    async def update_one(self, id: int, **kwargs):
+        row = self.rows.get(id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="This entry does not exist")
+        self._check_unique(kwargs, exclude=id)
+        self._unindex(row)
+        for key, value in kwargs.items():
+            setattr(row, key, value)
+        self._index(row)
+        return row.to_read_model()
+
+    async def delete_one(self, id: int) -> bool:
+        if self._remove(id) is None:
+            raise HTTPException(status_code=404, detail="Entry not found.")
         return True
+
+    async def get_many_by_ids(self, ids: List[int]) -> List[model]:
+        return [
+            self.rows[id].to_read_model() for id in sorted(set(ids)) if id in self.rows
+        ]
+
+    async def get_many_by(self, field: str, values: List[Any]) -> List[model]:
+        if field in self.indexes:
+            index = self.indexes[field]
+            ids = {index[value] for value in values if value in index}
+            return [self.rows[id].to_read_model() for id in sorted(ids)]
+        values = set(values)
+        return [
+            row.to_read_model()
+            for row in self.rows.values()
+            if getattr(row, field) in values
+        ]
+
+    async def add_many(self, data: List[dict]) -> List[model]:
+        # Как и многострочный INSERT: либо все строки, либо ни одной
+        for field in self.indexes:
+            values = [item[field] for item in data if item.get(field) is not None]
+            if len(values) != len(set(values)):
+                raise HTTPException(
+                    status_code=409,
+                    detail="Unique constraint violated: data already exists.",
+                )
+        for item in data:
+            self._check_unique(item)
+        return [self._insert(item) for item in data]
+
+    async def delete_many(self, ids: List[int]) -> List[int]:
+        deleted = []
+        for id in ids:
+            if self._remove(id) is not None:
+                deleted.append(id)
+        return deleted
@@ -0,0 +1,76 @@
+from email.utils import format_datetime
+from typing import AsyncIterator
+
+from fastapi import UploadFile
+from fastapi.responses import StreamingResponse
+
+from config import configs
+
+
+async def iter_upload_file(
+    file: UploadFile, chunk_size: int = configs.UPLOAD_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+class PartReader:
+    """Нарезает поток байтов на части фиксированного размера.
+
+    В памяти одновременно держится не больше одной части и одного чанка.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], part_size: int):
+        self._chunks = chunks.__aiter__()
+        self._part_size = part_size
+        self._buffer = bytearray()
+        self._exhausted = False
+
+    async def read(self) -> bytes:
+        while len(self._buffer) < self._part_size and not self._exhausted:
+            try:
+                self._buffer += await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._exhausted = True
+        part = bytes(self._buffer[: self._part_size])
+        del self._buffer[: self._part_size]
+        return part
+
+    @property
+    def exhausted(self) -> bool:
+        return self._exhausted and not self._buffer
+
+
+async def iter_object_body(body, chunk_size: int) -> AsyncIterator[bytes]:
+    # Соединение с MinIO освобождается и при обрыве клиента
+    async with body:
+        async for chunk in body.iter_chunks(chunk_size):
+            yield chunk
+
+
+def object_response(
+    s3_object: dict,
+    cache_control: str = configs.CACHE_CONTROL_MEDIA_CONTENT,
+    chunk_size: int = configs.DOWNLOAD_CHUNK_SIZE,
+) -> StreamingResponse:
+    """Отдаёт ответ get_object потоком, не собирая файл в памяти."""
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(s3_object["ContentLength"]),
+    }
+    if s3_object.get("ContentRange"):
+        headers["Content-Range"] = s3_object["ContentRange"]
+    if s3_object.get("ETag"):
+        headers["ETag"] = s3_object["ETag"]
+    if s3_object.get("LastModified"):
+        headers["Last-Modified"] = format_datetime(
+            s3_object["LastModified"], usegmt=True
+        )
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return StreamingResponse(
+        iter_object_body(s3_object["Body"], chunk_size),
+        status_code=s3_object["ResponseMetadata"]["HTTPStatusCode"],
+        headers=headers,
+        media_type=s3_object.get("ContentType"),
+    )
@@ -0,0 +1,41 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def sign_token(payload: dict, secret: str, expires_in: int) -> str:
+    """Подписанный токен без состояния: base64(payload).base64(hmac)."""
+    payload = {**payload, "exp": int(time.time()) + expires_in}
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    signature = hmac.new(secret.encode(), body.encode(), hashlib.sha256).digest()
+    return f"{body}.{_b64encode(signature)}"
+
+
+def load_token(token: str, secret: str) -> dict:
+    try:
+        body, signature = token.split(".")
+        expected = hmac.new(secret.encode(), body.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(_b64decode(signature), expected):
+            raise InvalidToken("Bad signature")
+        payload = json.loads(_b64decode(body))
+    except InvalidToken:
+        raise
+    except ValueError as e:
+        raise InvalidToken(str(e))
+    if payload.get("exp", 0) < time.time():
+        raise InvalidToken("Token expired")
+    return payload
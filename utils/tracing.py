@@ -0,0 +1,254 @@
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from config import configs
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self) -> str:
+        flags = "01" if self.sampled else "00"
+        return f"00-{self.trace_id}-{self.span_id}-{flags}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """Разбор заголовка W3C traceparent; невалидный заголовок игнорируется."""
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "service",
+        "context",
+        "parent_id",
+        "attributes",
+        "status",
+        "start_time",
+        "_started",
+        "duration",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        service: str,
+        context: SpanContext,
+        parent_id: Optional[str] = None,
+        attributes: Optional[dict] = None,
+    ):
+        self.name = name
+        self.service = service
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.status = "ok"
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if self.context.sampled and exporter is not None:
+            exporter.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Пишет завершённые span'ы строками JSON в фоновом потоке.
+
+    Запись не блокирует цикл событий: при переполнении очереди
+    span'ы отбрасываются и учитываются в dropped.
+    """
+
+    def __init__(self, stream, max_queue_size: int = 10000):
+        self.stream = stream
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+        self._thread = threading.Thread(
+            target=self._run, name="span-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self.queue.put_nowait(span.to_dict())
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            try:
+                self.stream.write(json.dumps(item, default=str) + "\n")
+                if self.queue.empty():
+                    self.stream.flush()
+            except Exception as e:
+                logger.error("Span export failed: %s", e)
+
+    def shutdown(self, timeout: float = 5) -> None:
+        self.queue.put(None)
+        self._thread.join(timeout)
+        self.stream.flush()
+
+
+def build_exporter() -> Optional[SpanExporter]:
+    if configs.TRACING_EXPORTER == "stdout":
+        stream = sys.stdout
+    elif configs.TRACING_EXPORTER == "file":
+        stream = open(configs.TRACING_FILE, "a", encoding="utf-8")
+    else:
+        return None
+    span_exporter = SpanExporter(stream, configs.TRACING_QUEUE_SIZE)
+    # Дописать очередь при остановке процесса
+    atexit.register(span_exporter.shutdown)
+    return span_exporter
+
+
+exporter: Optional[SpanExporter] = build_exporter()
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.context.trace_id if span is not None else None
+
+
+def child_span(name: str, **attributes) -> Optional[Span]:
+    """Дочерний span текущего запроса; завершать вызовом end().
+
+    Вне запроса (фоновые задачи, опрос очереди) span не создаётся,
+    чтобы не плодить корневые трассы.
+    """
+    parent = _current_span.get()
+    if exporter is None or parent is None:
+        return None
+    context = SpanContext(
+        parent.context.trace_id, secrets.token_hex(8), parent.context.sampled
+    )
+    return Span(name, parent.service, context, parent.context.span_id, attributes)
+
+
+@contextmanager
+def start_span(name: str, **attributes):
+    span = child_span(name, **attributes)
+    if span is None:
+        yield None
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.status = "error"
+        span.set_attribute("error", repr(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+class TracingMiddleware:
+    """ASGI-middleware: корневой span на запрос, продолжает входящий traceparent."""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or exporter is None:
+            return await self.app(scope, receive, send)
+
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+        if parent is not None:
+            trace_id, sampled = parent.trace_id, parent.sampled
+        else:
+            trace_id = secrets.token_hex(16)
+            sampled = random.random() < configs.TRACING_SAMPLE_RATIO
+
+        span = Span(
+            f"{scope['method']} {scope['path']}",
+            self.service,
+            SpanContext(trace_id, secrets.token_hex(8), sampled),
+            parent.span_id if parent is not None else None,
+            {"http.method": scope["method"]},
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = "error"
+            await send(message)
+
+        token = _current_span.set(span)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            _current_span.reset(token)
+            # Имя по шаблону маршрута известно только после роутинга
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"{scope['method']} {route.path}"
+            span.end()